@@ -0,0 +1,122 @@
+"""
+Parity check between two sentence model backends on the bundled collections.
+
+Extracts the sections of every input/Collection * once, then ranks them with
+the reference and candidate backends. For each collection it reports:
+- how many of the reference top-k sections the candidate also ranks in its top-k
+- the largest importance_rank shift among them
+- the largest score difference
+- Spearman's rank correlation over all sections
+- the encode time with each backend
+
+Exits non-zero when any collection is outside the tolerances.
+
+    python benchmarks/backend_parity.py [--candidate int8] [--threads 4] [--top-k 10]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import numpy as np  # noqa: E402
+
+from main import process_pdfs, read_collection_input  # noqa: E402
+from modules import models  # noqa: E402
+from modules.relevence_model import encode_texts  # noqa: E402
+
+DEFAULT_TOP_K = 10
+MIN_TOP_K_OVERLAP = 0.8
+MAX_RANK_SHIFT = 3
+MAX_SCORE_DIFF = 0.02
+
+
+def importance_ranks(similarities):
+    """0-based importance_rank of every section, ordered as rank_texts orders them."""
+    order = np.argsort(-np.round(similarities, 4), kind="stable")
+    ranks = np.empty(len(order), dtype=np.int64)
+    ranks[order] = np.arange(len(order))
+    return ranks
+
+
+def score_with_backend(backend, num_threads, queries, bodies):
+    """Returns ((sections x queries) similarities, seconds spent encoding the section bodies)."""
+    models.configure_sentence_backend(backend, num_threads)
+    query_embeddings = encode_texts(queries)  # also loads the model, outside the timing
+    start = time.perf_counter()
+    section_embeddings = encode_texts(bodies)
+    return section_embeddings @ query_embeddings.T, time.perf_counter() - start
+
+
+def compare_rankings(reference, candidate, top_k):
+    reference_ranks, candidate_ranks = importance_ranks(reference), importance_ranks(candidate)
+    top = np.flatnonzero(reference_ranks < top_k)
+    k = len(top)
+    n = len(reference_ranks)
+    spearman = (
+        1 - 6 * float(((reference_ranks - candidate_ranks) ** 2).sum()) / (n * (n * n - 1))
+        if n > 1 else 1.0
+    )
+    return {
+        "top_k_overlap": float((candidate_ranks[top] < top_k).sum()) / k if k else 1.0,
+        "max_rank_shift": int(np.abs(reference_ranks[top] - candidate_ranks[top]).max()) if k else 0,
+        "max_score_diff": float(np.abs(reference - candidate).max()) if n else 0.0,
+        "spearman": spearman,
+    }
+
+
+def within_tolerance(metrics, args):
+    return (
+        metrics["top_k_overlap"] >= args.min_overlap
+        and metrics["max_rank_shift"] <= args.max_shift
+        and metrics["max_score_diff"] <= args.max_score_diff
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--reference", choices=models.SENTENCE_BACKENDS, default="torch")
+    parser.add_argument("--candidate", choices=models.SENTENCE_BACKENDS, default="int8")
+    parser.add_argument("--threads", type=int, help="intra-op threads for both backends")
+    parser.add_argument("--top-k", type=int, default=DEFAULT_TOP_K)
+    parser.add_argument("--min-overlap", type=float, default=MIN_TOP_K_OVERLAP)
+    parser.add_argument("--max-shift", type=int, default=MAX_RANK_SHIFT)
+    parser.add_argument("--max-score-diff", type=float, default=MAX_SCORE_DIFF)
+    args = parser.parse_args()
+
+    failures = 0
+    for collection_path in sorted(glob.glob(os.path.join(REPO_ROOT, "input", "*"))):
+        input_json_path = os.path.join(collection_path, "challenge1b_input.json")
+        if not os.path.exists(input_json_path):
+            continue
+        input_documents, queries, _ = read_collection_input(input_json_path)
+        store = process_pdfs(collection_path, input_documents)
+        if not len(store):
+            continue
+        query_texts = [f"{persona}: {job}" for persona, job in queries]
+
+        reference, reference_seconds = score_with_backend(args.reference, args.threads, query_texts, store.bodies)
+        candidate, candidate_seconds = score_with_backend(args.candidate, args.threads, query_texts, store.bodies)
+
+        name = os.path.basename(collection_path)
+        print(f"\n{name}: {len(store)} sections, encode {args.reference} {reference_seconds:.3f}s, "
+              f"{args.candidate} {candidate_seconds:.3f}s ({reference_seconds / max(candidate_seconds, 1e-9):.2f}x)")
+        for query_index, query in enumerate(query_texts):
+            metrics = compare_rankings(reference[:, query_index], candidate[:, query_index], args.top_k)
+            ok = within_tolerance(metrics, args)
+            failures += not ok
+            print(f"  [{'ok' if ok else 'FAIL'}] {query[:60]!r}: top-{args.top_k} overlap "
+                  f"{metrics['top_k_overlap']:.0%}, max rank shift {metrics['max_rank_shift']}, "
+                  f"max score diff {metrics['max_score_diff']:.4f}, spearman {metrics['spearman']:.4f}")
+
+    if failures:
+        print(f"\n{failures} query ranking(s) outside tolerance")
+        sys.exit(1)
+    print("\nRankings within tolerance")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Import-time budget check for the CLI entry point.
+
+Runs ``import main`` in fresh interpreters and fails when the fastest run
+exceeds the budget, so heavy imports (spaCy, NLTK, torch) stay deferred.
+
+    python benchmarks/import_time.py [--budget 0.5] [--runs 5]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BUDGET = 0.5  # seconds
+
+PROBE = "import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+
+
+def measure(module="main", runs=5):
+    timings = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module)],
+            cwd=REPO_ROOT, check=True, capture_output=True, text=True,
+        ).stdout
+        timings.append(float(out.strip().splitlines()[-1]))
+    return min(timings)
+
+
+def slowest_imports(module="main", top=10):
+    """Cumulative import times (in seconds) of the heaviest modules pulled in."""
+    err = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, check=True, capture_output=True, text=True,
+    ).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if name.strip() != module:
+            rows.append((int(cumulative) / 1e6, name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET, help="seconds (default: %(default)s)")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    elapsed = measure(args.module, args.runs)
+    print(f"import {args.module}: {elapsed:.3f}s (budget {args.budget:.3f}s)")
+    for seconds, name in slowest_imports(args.module):
+        print(f"  {seconds:8.3f}s  {name}")
+
+    if elapsed > args.budget:
+        print("Import-time budget exceeded")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Recall of the BM25 pre-filter (--prefilter N) against full dense scoring.
+
+For every input/Collection * and every N, the check does three things:
+- It takes the sections that survive the pre-filter.
+- It ranks them by their dense score, as rank_texts does.
+- It reports recall@k: the fraction of the fully dense top-k that the
+  two-stage ranking still places in its top-k. The fraction of sections that
+  had to be embedded is shown too.
+
+    python benchmarks/prefilter_recall.py [--top-n 10 25 50 100] [--k 5 10]
+"""
+import argparse
+import glob
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import numpy as np  # noqa: E402
+
+from main import process_pdfs, read_collection_input  # noqa: E402
+from modules.lexical import lexical_scores  # noqa: E402
+from modules.relevence_model import encode_texts, prefilter_candidates  # noqa: E402
+
+DEFAULT_TOP_N = [10, 25, 50, 100]
+DEFAULT_K = [5, 10]
+
+
+def dense_top(similarities, rows, k):
+    """The k best of rows by rounded dense score, ties in section order."""
+    rows = np.asarray(rows)
+    order = np.argsort(-np.round(similarities[rows], 4), kind="stable")
+    return set(rows[order[:k]].tolist())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--top-n", type=int, nargs="+", default=DEFAULT_TOP_N,
+                        help="pre-filter sizes to evaluate (default: %(default)s)")
+    parser.add_argument("--k", type=int, nargs="+", default=DEFAULT_K, help="recall cut-offs (default: %(default)s)")
+    args = parser.parse_args()
+
+    header = f"{'collection':16s} {'query':>5s} {'N':>5s} {'embedded':>9s} " + " ".join(
+        f"{f'recall@{k}':>10s}" for k in args.k
+    )
+    rows = []
+    for collection_path in sorted(glob.glob(os.path.join(REPO_ROOT, "input", "*"))):
+        input_json_path = os.path.join(collection_path, "challenge1b_input.json")
+        if not os.path.exists(input_json_path):
+            continue
+        input_documents, queries, _ = read_collection_input(input_json_path)
+        store = process_pdfs(collection_path, input_documents)
+        if not len(store):
+            continue
+
+        query_texts = [f"{persona}: {job}" for persona, job in queries]
+        dense = encode_texts(store.bodies) @ encode_texts(query_texts).T
+        lexical = lexical_scores(query_texts, store.bodies, store.keywords)
+        everything = range(len(store))
+
+        for top_n in args.top_n:
+            candidates = prefilter_candidates(lexical, top_n) if len(store) > top_n else list(everything)
+            for query_index in range(len(query_texts)):
+                column = dense[:, query_index]
+                recalls = [
+                    len(dense_top(column, everything, k) & dense_top(column, candidates, k)) / min(k, len(store))
+                    for k in args.k
+                ]
+                rows.append(
+                    f"{os.path.basename(collection_path):16s} {query_index:5d} {top_n:5d} "
+                    f"{len(candidates) / len(store):9.0%} " + " ".join(f"{recall:10.2f}" for recall in recalls)
+                )
+
+    print("\n" + header)
+    print("\n".join(rows))
+
+
+if __name__ == "__main__":
+    main()
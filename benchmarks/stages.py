@@ -0,0 +1,245 @@
+"""
+Stage-level benchmark of the extraction and ranking pipeline.
+
+Times every stage separately: parse, outline, refine, match, enrich, embed
+and rank. Workloads are the bundled collections (input/Collection *) and
+synthetic PDFs generated with PyMuPDF at increasing page counts and heading
+densities. Each stage keeps the fastest of --repeat runs. Results are
+written as JSON. With --baseline, the run is compared against an earlier
+results file and the script fails on any stage slower than the threshold.
+
+    python benchmarks/stages.py [--repeat 3] [--output results.json]
+    python benchmarks/stages.py --baseline old.json [--threshold 0.15]
+"""
+import argparse
+import copy
+import glob
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import fitz  # noqa: E402
+
+from main import read_collection_input  # noqa: E402
+from modules import models  # noqa: E402
+from modules.extractor import (  # noqa: E402
+    enrich_blocks, extract_outline, extract_pages_text, extract_section_blocks, parse_document,
+)
+from modules.filters import refine_outline_structure  # noqa: E402
+from modules.rank_sections import rank_store  # noqa: E402
+from modules.relevence_model import encode_texts, order_sections  # noqa: E402
+from modules.section_store import SectionStore  # noqa: E402
+
+STAGES = ["parse", "outline", "refine", "match", "enrich", "embed", "rank"]
+
+SYNTHETIC_PAGES = [5, 25, 100]
+SYNTHETIC_HEADINGS_PER_PAGE = [1, 4]
+SYNTHETIC_QUERY = "Researcher: Summarise the key findings on each topic."
+
+# A stage regresses when it is both this much slower (relative) and slower
+# by at least MIN_DELTA seconds, so sub-millisecond noise never fails a run
+DEFAULT_THRESHOLD = 0.15
+MIN_DELTA = 0.005
+
+WORDS = (
+    "analysis method result sample data model process design system value energy market region "
+    "policy study review report growth network signal measure factor control period source"
+).split()
+
+
+### WORKLOADS ###
+
+def collection_workloads():
+    workloads = {}
+    for collection_path in sorted(glob.glob(os.path.join(REPO_ROOT, "input", "*"))):
+        input_json_path = os.path.join(collection_path, "challenge1b_input.json")
+        if not os.path.exists(input_json_path):
+            continue
+        input_documents, queries, _ = read_collection_input(input_json_path)
+        pdfs = [
+            os.path.join(collection_path, "PDFs", filename)
+            for filename in input_documents
+            if os.path.exists(os.path.join(collection_path, "PDFs", filename))
+        ]
+        persona, job = queries[0]
+        workloads[os.path.basename(collection_path)] = (pdfs, f"{persona}: {job}")
+    return workloads
+
+
+def write_synthetic_pdf(path, n_pages, headings_per_page, seed=0):
+    """A PDF whose headings (bold, larger) are each followed by a paragraph of body text."""
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for _ in range(n_pages):
+        page = doc.new_page()
+        y = 72
+        slot = (page.rect.height - 144) / headings_per_page
+        for _ in range(headings_per_page):
+            # Unnumbered: the outline filters reject headings that start with a number
+            title = " ".join(rng.choice(WORDS).capitalize() for _ in range(rng.randint(2, 4)))
+            page.insert_text((72, y), title, fontsize=16, fontname="hebo")
+            body = " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 90))).capitalize() + "."
+            page.insert_textbox(fitz.Rect(72, y + 12, page.rect.width - 72, y + slot - 8), body,
+                                fontsize=10, fontname="helv")
+            y += slot
+    doc.save(path)
+    doc.close()
+
+
+def synthetic_workloads(out_dir, page_counts=SYNTHETIC_PAGES, densities=SYNTHETIC_HEADINGS_PER_PAGE):
+    workloads = {}
+    for n_pages in page_counts:
+        for headings_per_page in densities:
+            name = f"synthetic-{n_pages}p-{headings_per_page}h"
+            path = os.path.join(out_dir, f"{name}.pdf")
+            write_synthetic_pdf(path, n_pages, headings_per_page)
+            workloads[name] = ([path], SYNTHETIC_QUERY)
+    return workloads
+
+
+### STAGES ###
+
+def timed(timings, stage, func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+    return result
+
+
+def run_stages(pdfs, query):
+    """One pass over a workload; returns {stage: seconds} summed over its PDFs."""
+    timings = {}
+    blocks = []
+    for pdf_path in pdfs:
+        base_name = os.path.splitext(os.path.basename(pdf_path))[0]
+
+        def parse():
+            pages = parse_document(pdf_path)
+            return pages, extract_pages_text(pdf_path, pages)
+
+        pages, page_texts = timed(timings, "parse", parse)
+        result = timed(timings, "outline", extract_outline, pdf_path, pages)
+        outline = timed(timings, "refine", refine_outline_structure, result.get("outline", []))
+        blocks.extend(timed(timings, "match", extract_section_blocks, base_name, outline, page_texts))
+
+    # Enrichment annotates blocks in place; time it on a copy
+    enriched = copy.deepcopy(blocks)
+    timed(timings, "enrich", enrich_blocks, enriched)
+
+    def embed():
+        return encode_texts([query]), encode_texts([block["body_text"] for block in blocks])
+
+    query_embeddings, section_embeddings = timed(timings, "embed", embed)
+
+    store = SectionStore()
+    for block in blocks:
+        store.append(block)
+
+    def rank():
+        orders, _ = order_sections(query_embeddings, section_embeddings)
+        return [rank_store(store, order) for order in orders]
+
+    timed(timings, "rank", rank)
+    return timings
+
+
+def benchmark(workloads, repeat=3, stages=STAGES):
+    results = {}
+    for name, (pdfs, query) in workloads.items():
+        best = {}
+        for _ in range(repeat):
+            for stage, seconds in run_stages(pdfs, query).items():
+                best[stage] = min(best.get(stage, seconds), seconds)
+        results[name] = {stage: round(best[stage], 6) for stage in stages if stage in best}
+        print(f"{name:28s} " + "  ".join(f"{stage} {seconds:.4f}s" for stage, seconds in results[name].items()))
+    return results
+
+
+### BASELINE COMPARISON ###
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD, min_delta=MIN_DELTA):
+    """Prints a per-stage comparison and returns the regressed (workload, stage) pairs."""
+    regressions = []
+    print(f"\n{'workload':28s} {'stage':8s} {'baseline':>10s} {'current':>10s} {'change':>8s}")
+    for name, stages in results.items():
+        for stage, seconds in stages.items():
+            before = baseline.get(name, {}).get(stage)
+            if before is None:
+                continue
+            change = (seconds - before) / before if before else 0.0
+            regressed = change > threshold and seconds - before > min_delta
+            if regressed:
+                regressions.append((name, stage))
+            print(f"{name:28s} {stage:8s} {before:10.4f} {seconds:10.4f} {change:+7.1%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="runs per workload; the fastest is kept")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES, help="stages reported")
+    parser.add_argument("--no-collections", action="store_true", help="skip the bundled collections")
+    parser.add_argument("--no-synthetic", action="store_true", help="skip the synthetic PDFs")
+    parser.add_argument("--pages", type=int, nargs="+", default=SYNTHETIC_PAGES,
+                        help="synthetic page counts (default: %(default)s)")
+    parser.add_argument("--densities", type=int, nargs="+", default=SYNTHETIC_HEADINGS_PER_PAGE,
+                        help="synthetic headings per page (default: %(default)s)")
+    parser.add_argument("--output", default="stage_benchmark.json", help="results file (default: %(default)s)")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown counted as a regression (default: %(default)s)")
+    args = parser.parse_args()
+
+    # Model loading is a one-off cost, not part of any stage
+    models.warm_up()
+
+    with tempfile.TemporaryDirectory() as synthetic_dir:
+        workloads = {}
+        if not args.no_collections:
+            workloads.update(collection_workloads())
+        if not args.no_synthetic:
+            workloads.update(synthetic_workloads(synthetic_dir, args.pages, args.densities))
+        results = benchmark(workloads, args.repeat, args.stages)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} stage(s) regressed beyond {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,81 @@
 import os
 import json
+import argparse
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
 
 
-from modules.extractor import extract_outline, extract_section_blocks, extract_pages_text
+from modules.extractor import (
+    EXTRACTOR_VERSION, iter_pages, extract_outline, extract_section_blocks, enrich_blocks,
+)
+from modules.extraction_cache import ExtractionCache, file_digest
 from modules.filters import refine_outline_structure
-from modules.relevence_model import compute_relevance_score
-from modules.rank_sections import rank_sections
+from modules.dedup import group_near_duplicates
+from modules.relevence_model import (
+    rank_texts, encode_texts, open_embedding_cache, open_corpus_index
+)
+from modules.rank_sections import rank_store, rank_from_index
+from modules.section_store import SectionStore
+from modules.refinement import refine_top_sections
+from modules.scheduler import run_stages
+from modules.stream_output import JsonlOutputWriter
+from modules import models, tracing
 
 # === Optional: Enable/Disable Phase 3 ===
 RUN_PHASE_3 = True
 
 COLLECTIONS_DIR = "input"
 
+# Section embeddings are reused across runs; set to None to disable
+EMBEDDING_CACHE_DIR = os.path.join(".cache", "embeddings")
+EMBEDDING_CACHE_MAX_ENTRIES = 100_000
+
+# Extracted blocks per PDF, keyed by file content; set to None to disable
+EXTRACTION_CACHE_DIR = os.path.join(".cache", "extraction")
+
+# Documents extracted concurrently in worker processes; 1 keeps extraction in-process
+NUM_WORKERS = 1
+
+# spaCy enrichment runs once per collection over every newly extracted block
+SPACY_BATCH_SIZE = 64
+SPACY_N_PROCESS = 1
+
+# Heading candidates kept per page; None keeps them all. When set, pages are
+# streamed through the outline extractor so peak memory stays flat on very
+# large PDFs.
+OUTLINE_TOP_K = None
+
+# Sentence model backend ("torch" or the faster, quantized "int8") and its
+# intra-op thread count (None: torch's default)
+SENTENCE_BACKEND = "torch"
+NUM_THREADS = None
+
+# Shingle Jaccard similarity at which blocks count as near-duplicates and are
+# folded into one; None keeps every block
+DEDUP_THRESHOLD = None
+
+# Sections BM25 keeps per query for the SentenceTransformer; None embeds them all
+PREFILTER_TOP_N = None
+
+# Subsection analysis: when set, only each query's REFINE_TOP_K best sections
+# are listed, their refined_text cut down to the sentences closest to the
+# query (at most REFINE_MAX_CHARS). None lists every section's full body text.
+REFINE_TOP_K = None
+REFINE_MAX_CHARS = 500
+
+# A batch run passes collections through three stages (extract, enrich, rank)
+# in their own threads, so extraction of one collection overlaps the model work
+# on the ones before it. This many collections may wait between two stages;
+# 0 processes the collections one after another.
+PIPELINE_DEPTH = 1
+
+# "json" writes one indented challenge1b_output.json per collection once it is
+# done; "jsonl" streams records to challenge1b_output.jsonl as they are produced
+OUTPUT_FORMAT = "json"
+
 def ensure_directories():
     os.makedirs(COLLECTIONS_DIR, exist_ok=True)
 
@@ -25,10 +88,132 @@ def find_all_pdfs(root_dir):
                 pdf_paths.append(os.path.join(root, file))
     return pdf_paths
 
-def process_pdfs(collection_path, input_documents):
+def extraction_version(outline_top_k=None):
+    # Bounded outline extraction may pick different headings, so cache it apart
+    if outline_top_k is None:
+        return EXTRACTOR_VERSION
+    return f"{EXTRACTOR_VERSION}-top{outline_top_k}"
+
+def extract_document_blocks(pdf_path, base_name, outline_top_k=None):
+    # Stream the pages, each parsed once; only their plain text outlives the
+    # outline pass, so memory does not grow with the page count
+    page_texts = []
+    with tracing.span("outline", doc=base_name):
+        result = extract_outline(pdf_path, iter_pages(pdf_path, page_texts), top_k=outline_top_k)
+
+    with tracing.span("refine", doc=base_name):
+        result["outline"] = refine_outline_structure(result.get("outline", []))
+    with tracing.span("match", doc=base_name):
+        return extract_section_blocks(base_name, result["outline"], page_texts)
+
+def init_extraction_worker(trace=False):
+    # Each worker loads the extraction models once here rather than per document.
+    # spaCy is not needed: enrichment runs as a batched stage in the parent.
+    if trace:
+        tracing.enable()
+    models.warm_up(["nltk"])
+
+def extract_document_safely(pdf_path, base_name, outline_top_k=None):
+    """Returns (blocks, error) so that one bad document never fails the collection."""
+    try:
+        with tracing.span("extract", doc=base_name):
+            return extract_document_blocks(pdf_path, base_name, outline_top_k), None
+    except Exception as e:
+        return None, f"{e}\n{traceback.format_exc()}"
+
+def extract_document_in_worker(pdf_path, base_name, outline_top_k=None):
+    """extract_document_safely plus whatever the worker traced, for tracing.merge in the parent."""
+    return extract_document_safely(pdf_path, base_name, outline_top_k), tracing.drain()
+
+class ExtractionPool:
+    """
+    Worker processes for document extraction. A worker that dies (e.g. the
+    PDF library crashing on a malformed file) breaks its ProcessPoolExecutor
+    for good, so the pool is replaced by a fresh one rather than reused.
+
+    submit returns (generation, future); pass the generation to replace so
+    that a pool another caller has already replaced is left alone.
+    """
+
+    def __init__(self, num_workers):
+        self.num_workers = num_workers
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._executor = self._start()
+
+    def _start(self):
+        return ProcessPoolExecutor(max_workers=self.num_workers, initializer=init_extraction_worker,
+                                   initargs=(tracing.enabled(),))
+
+    def submit(self, fn, *args):
+        with self._lock:
+            generation, executor = self.generation, self._executor
+        try:
+            return generation, executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self.replace(generation)
+            return self.submit(fn, *args)
+
+    def replace(self, generation):
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._start()
+            self.generation += 1
+
+    def shutdown(self):
+        self._executor.shutdown()
+
+def create_extraction_pool(num_workers=NUM_WORKERS):
+    if num_workers <= 1:
+        return None
+    return ExtractionPool(num_workers)
+
+def extract_document_alone(executor, pdf_path, base_name, outline_top_k=None):
+    """
+    Retries a document that a broken pool left unfinished, with the fresh pool
+    to itself, so it only fails if its own worker dies again.
+    """
+    generation, future = executor.submit(extract_document_in_worker, pdf_path, base_name, outline_top_k)
+    try:
+        outcome, trace = future.result()
+    except BrokenProcessPool as e:
+        executor.replace(generation)
+        return None, f"extraction worker died: {e}"
+    tracing.merge(trace)
+    return outcome
+
+def duplicate_record(block):
+    return {"doc": block["doc"], "page": block["page"], "section_title": block["section_title"]}
+
+def process_pdfs(collection_path, input_documents, extraction_cache=None, executor=None, writer=None,
+                 outline_top_k=None, dedup_threshold=None):
+    """
+    Returns the collection's sections as a SectionStore, in input order.
+
+    With a JsonlOutputWriter, the subsection records are written from the
+    store as its rows are added.
+
+    dedup_threshold: when set, blocks whose shingle Jaccard similarity reaches
+    it are grouped and only the first of each group is stored, with the
+    others listed under its "duplicates".
+    """
+    merged, fresh = extract_collection_blocks(collection_path, input_documents, extraction_cache, executor,
+                                              outline_top_k)
+    return build_section_store(merged, fresh, extraction_cache, writer, dedup_threshold)
+
+def extract_collection_blocks(collection_path, input_documents, extraction_cache=None, executor=None,
+                              outline_top_k=None):
+    """
+    First half of process_pdfs: loads or extracts every document's blocks.
+    Returns (merged, fresh): the block lists of the documents that succeeded,
+    in input order, and the (digest, blocks) of those that were not cached.
+    """
     pdf_dir = os.path.join(collection_path, "PDFs")
-    sections, subsection_analysis = [], []
 
+    # Resolve cache hits first; only the remaining documents are extracted
+    results, pending, cached = {}, [], set()
     for doc in input_documents:
         pdf_path = os.path.join(pdf_dir, doc)
         if not os.path.exists(pdf_path):
@@ -36,29 +221,98 @@ def process_pdfs(collection_path, input_documents):
             continue
 
         base_name = os.path.splitext(doc)[0]
-        print(f" Extracting from: {doc}")
+        digest = file_digest(pdf_path) if extraction_cache is not None else None
+        blocks = extraction_cache.load(digest, base_name) if digest else None
+
+        if blocks is not None:
+            print(f" Loaded from cache: {doc}")
+            results[doc] = (blocks, None, None)
+            cached.add(doc)
+        else:
+            print(f" Extracting from: {doc}")
+            pending.append((doc, pdf_path, base_name, digest))
+
+    futures = {}
+    if executor is not None and len(pending) > 1:
+        for doc, pdf_path, base_name, digest in pending:
+            futures[doc] = (executor.submit(extract_document_in_worker, pdf_path, base_name, outline_top_k),
+                            pdf_path, base_name, digest)
+    else:
+        for doc, pdf_path, base_name, digest in pending:
+            results[doc] = extract_document_safely(pdf_path, base_name, outline_top_k) + (digest,)
+
+    # Merge in input order so the output stays deterministic
+    merged, fresh = [], []
+    for doc in input_documents:
+        if doc in futures:
+            (generation, future), pdf_path, base_name, digest = futures.pop(doc)
+            try:
+                outcome, trace = future.result()
+                tracing.merge(trace)
+            except BrokenProcessPool:
+                # A worker died and took every unfinished document with it;
+                # rerun them one at a time to find the one that kills it
+                executor.replace(generation)
+                outcome = extract_document_alone(executor, pdf_path, base_name, outline_top_k)
+            except Exception as e:
+                outcome = (None, f"{e}")
+            results[doc] = outcome + (digest,)
+        if doc not in results:
+            continue
 
-        try:
-            result = extract_outline(pdf_path)
-            result["outline"] = refine_outline_structure(result.get("outline", []))
-            page_texts = extract_pages_text(pdf_path)
-            blocks = extract_section_blocks(base_name, result["outline"], page_texts)
-
-            for block in blocks:
-                sections.append(block)
-                subsection_analysis.append({
-                    "doc": block["doc"],
-                    "page": block["page"],
-                    "refined_text": block["body_text"]
-                })
-
-        except Exception as e:
-            import traceback
-            traceback.print_exc()
-            print(f" Failed to process {doc}: {e}")
+        blocks, error, digest = results[doc]
+        if error is not None:
+            print(f" Failed to process {doc}: {error}")
             continue
+        merged.append(blocks)
+        if doc not in cached:  # cache hits are already enriched
+            fresh.append((digest, blocks))
+
+    return merged, fresh
+
+def build_section_store(merged, fresh, extraction_cache=None, writer=None, dedup_threshold=None):
+    """Second half of process_pdfs: folds near-duplicates, enriches the fresh blocks and stores them."""
+    # Near-duplicate blocks (e.g. the same guide in several files) are folded
+    # into the first of their group, which alone is enriched, ranked and output
+    all_blocks = [block for blocks in merged for block in blocks]
+    groups = []
+    if dedup_threshold is not None:
+        with tracing.span("dedup", blocks=len(all_blocks)):
+            groups = [
+                [all_blocks[i] for i in group]
+                for group in group_near_duplicates([block["body_text"] for block in all_blocks], dedup_threshold)
+            ]
+    members = {id(member) for group in groups for member in group[1:]}
+
+    # One nlp.pipe pass over every new block of the collection
+    with tracing.span("enrich"):
+        enrich_blocks(
+            [block for _, blocks in fresh for block in blocks if id(block) not in members],
+            batch_size=SPACY_BATCH_SIZE,
+            n_process=SPACY_N_PROCESS,
+        )
+    for digest, blocks in fresh:
+        # A document with folded, hence unenriched, blocks is not cached: its
+        # cache entry must not depend on the other documents of this run
+        if digest and all("entities" in block for block in blocks):
+            extraction_cache.store(digest, blocks)
+
+    duplicates_of = {
+        id(representative): [duplicate_record(block) for block in duplicates]
+        for representative, *duplicates in groups
+    }
+    if groups:
+        print(f" Folded {len(members)} near-duplicate blocks into {len(groups)} representatives")
+
+    store = SectionStore()
+    for block in all_blocks:
+        if id(block) in members:
+            continue
+        row = store.append(block, duplicates_of.get(id(block)))
+        if writer is not None:
+            writer.write("subsection_analysis", store.subsection_record(row))
 
-    return sections, subsection_analysis
+    return store
 
 
 def build_output_json(input_documents, persona, job, ranked_sections, subsection_analysis):
@@ -70,61 +324,392 @@ def build_output_json(input_documents, persona, job, ranked_sections, subsection
         "subsection_analysis": subsection_analysis
     }
 
-def run_phase_3():
-
-    for collection in sorted(os.listdir(COLLECTIONS_DIR)):
-        collection_path = os.path.join(COLLECTIONS_DIR, collection)
-        if not os.path.isdir(collection_path):
-            continue
-
+def update_corpus_index(corpus_index, collection_path, input_documents, store, embedding_cache=None):
+    """Appends the collection's new or changed documents to the corpus index."""
+    collection = os.path.basename(os.path.normpath(collection_path))
+    rows_by_doc = store.rows_by_doc()
+
+    with tracing.span("index", collection=collection):
+        for filename in input_documents:
+            doc = os.path.splitext(filename)[0]
+            # Documents without sections (or that failed) are retried on the next run
+            if doc not in rows_by_doc:
+                continue
+            digest = file_digest(os.path.join(collection_path, "PDFs", filename))
+            if corpus_index.is_current(collection, doc, digest):
+                continue
+
+            doc_sections = [store.section(row) for row in rows_by_doc[doc]]
+            embeddings = encode_texts([section["body_text"] for section in doc_sections], cache=embedding_cache)
+            corpus_index.add_document(collection, doc, digest, doc_sections, embeddings)
+
+def search_corpus(index_dir, query, top_k=10, approximate=False):
+    corpus_index = open_corpus_index(index_dir)
+    query_embedding = encode_texts([query])[0]
+    return rank_from_index(corpus_index, query_embedding, top_k, approximate)
+
+class Pipeline:
+    """
+    Caches, extraction pool and options shared by every collection handled in
+    one process, whether by a batch run over input/ or by the service.
+    """
+
+    def __init__(self, num_workers=NUM_WORKERS, output_format=OUTPUT_FORMAT, outline_top_k=OUTLINE_TOP_K,
+                 index_dir=None, prefilter_top_n=PREFILTER_TOP_N, dedup_threshold=DEDUP_THRESHOLD,
+                 refine_top_k=REFINE_TOP_K):
+        self.output_format = output_format
+        self.refine_top_k = refine_top_k
+        self.outline_top_k = outline_top_k
+        self.prefilter_top_n = prefilter_top_n
+        self.dedup_threshold = dedup_threshold
+        self.embedding_cache = (
+            open_embedding_cache(EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_MAX_ENTRIES)
+            if EMBEDDING_CACHE_DIR else None
+        )
+        self.extraction_cache = (
+            ExtractionCache(EXTRACTION_CACHE_DIR, extraction_version(outline_top_k))
+            if EXTRACTION_CACHE_DIR else None
+        )
+        self.executor = create_extraction_pool(num_workers)
+        self.index_dir = index_dir
+        self.corpus_index = open_corpus_index(index_dir) if index_dir else None
+        # spaCy and the sentence model are shared and not documented as thread-safe
+        self._model_lock = threading.Lock()
+
+    def process_collection(self, collection_path):
+        """
+        Runs one collection through the stages and returns its output path.
+        Concurrent calls (the service's --concurrency) extract side by side
+        but take turns enriching and ranking.
+        """
+        job = self._extract_stage(collection_path)
+        if job is None:
+            return None
+        try:
+            with self._model_lock:
+                return self._rank_stage(self._enrich_stage(job))
+        except BaseException:
+            abort_collection(job)
+            raise
+
+    def run(self, collection_paths, depth=PIPELINE_DEPTH):
+        """Processes the collections as a staged pipeline (see PIPELINE_DEPTH) and returns the output paths."""
+        return run_stages(collection_paths, [self._extract_stage, self._enrich_stage, self._rank_stage], depth,
+                          discard=self._discard)
+
+    # Each stage traces its part of a collection as a "collection" span
+    def _extract_stage(self, collection_path):
+        collection = os.path.basename(os.path.normpath(collection_path))
         print(f"\n Processing {collection}...")
-
-        input_json_path = os.path.join(collection_path, "challenge1b_input.json")
-        pdf_dir = os.path.join(collection_path, "pdfs")
-        output_json_path = os.path.join(collection_path, "challenge1b_output.json")
-
-        if not os.path.exists(input_json_path) or not os.path.exists(pdf_dir):
-            continue
-
-        with open(input_json_path, "r", encoding="utf-8") as f:
-            input_data = json.load(f)
-
-        persona = input_data.get("persona", {}).get("role", "")
-        job = input_data.get("job_to_be_done", {}).get("task", "")
-        query = f"{persona}: {job}"
-
-        input_documents = [
-            doc["filename"]
-            for doc in input_data.get("documents", [])
-            if isinstance(doc, dict) and "filename" in doc
+        with tracing.span("collection", collection=collection, stage="extract"):
+            job = start_collection(collection_path, self.output_format, self.refine_top_k)
+            if job is None:
+                return None
+            try:
+                job["blocks"] = extract_collection_blocks(
+                    collection_path, job["input_documents"], self.extraction_cache, self.executor,
+                    self.outline_top_k,
+                )
+            except BaseException:
+                abort_collection(job)
+                raise
+            return job
+
+    def _enrich_stage(self, job):
+        with tracing.span("collection", collection=job["collection"], stage="enrich"):
+            merged, fresh = job.pop("blocks")
+            job["store"] = build_section_store(merged, fresh, self.extraction_cache, job["subsection_writer"],
+                                               self.dedup_threshold)
+            return job
+
+    def _rank_stage(self, job):
+        with tracing.span("collection", collection=job["collection"], stage="rank"):
+            return finish_collection(job, job.pop("store"), self.embedding_cache, self.corpus_index,
+                                     self.prefilter_top_n)
+
+    def _discard(self, item):
+        # Jobs a failed run left in flight; their inputs (collection paths) need nothing
+        if isinstance(item, dict):
+            abort_collection(item)
+
+    def save_index(self, build_ivf=False):
+        if self.corpus_index is None:
+            return
+        if build_ivf:
+            self.corpus_index.build_ivf()
+        self.corpus_index.save()
+        print(f"Corpus index at {self.index_dir}: {len(self.corpus_index)} sections")
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+
+def run_phase_3(collections_dir=COLLECTIONS_DIR, num_workers=NUM_WORKERS, output_format=OUTPUT_FORMAT,
+                outline_top_k=OUTLINE_TOP_K, index_dir=None, build_ivf=False, prefilter_top_n=PREFILTER_TOP_N,
+                dedup_threshold=DEDUP_THRESHOLD, pipeline_depth=PIPELINE_DEPTH, refine_top_k=REFINE_TOP_K):
+    pipeline = Pipeline(num_workers, output_format, outline_top_k, index_dir, prefilter_top_n, dedup_threshold,
+                        refine_top_k)
+
+    try:
+        collection_paths = [
+            os.path.join(collections_dir, collection)
+            for collection in sorted(os.listdir(collections_dir))
+            if os.path.isdir(os.path.join(collections_dir, collection))
+        ]
+        pipeline.run(collection_paths, pipeline_depth)
+
+        pipeline.save_index(build_ivf)
+    finally:
+        pipeline.close()
+
+def read_collection_input(input_json_path):
+    """
+    Returns (input_documents, queries, multi_query). queries is a list of
+    (persona, job) pairs: the top-level persona/job_to_be_done, or every entry
+    of an optional "queries" list shaped the same way.
+    """
+    with open(input_json_path, "r", encoding="utf-8") as f:
+        input_data = json.load(f)
+
+    multi_query = "queries" in input_data
+    query_entries = input_data["queries"] if multi_query else [input_data]
+    queries = [
+        (entry.get("persona", {}).get("role", ""), entry.get("job_to_be_done", {}).get("task", ""))
+        for entry in query_entries
+    ]
+
+    input_documents = [
+        doc["filename"]
+        for doc in input_data.get("documents", [])
+        if isinstance(doc, dict) and "filename" in doc
+    ]
+    return input_documents, queries, multi_query
+
+def rank_queries(queries, store, embedding_cache=None, prefilter_top_n=None, refine_top_k=None):
+    """
+    Ranks the stored sections once per (persona, job) query, all scored in one
+    batch. Returns (ranked_per_query, refined_per_query): with refine_top_k,
+    the subsection records of each query's refine_top_k best sections with
+    their refined text; otherwise None.
+    """
+    query_texts = [f"{persona}: {job}" for persona, job in queries]
+    with tracing.span("score", queries=len(queries), sections=len(store)):
+        query_embeddings = encode_texts(query_texts)
+        orders, _ = rank_texts(query_texts, store.bodies, cache=embedding_cache, prefilter_top_n=prefilter_top_n,
+                               keywords=store.keywords, query_embeddings=query_embeddings)
+    with tracing.span("rank"):
+        ranked_per_query = [rank_store(store, order) for order in orders]
+
+    refined_per_query = None
+    if refine_top_k is not None:
+        refined_per_query = [
+            [store.subsection_record(row, refined_text) for row, refined_text in refined]
+            for refined in refine_top_sections(query_embeddings, store.bodies, orders, refine_top_k,
+                                               REFINE_MAX_CHARS)
         ]
+    return ranked_per_query, refined_per_query
 
-        # 🔄 Process PDFs and extract relevant sections
-        sections, subsection_analysis = process_pdfs(collection_path, input_documents)
+def process_collection(collection_path, embedding_cache=None, extraction_cache=None, executor=None,
+                       output_format=OUTPUT_FORMAT, outline_top_k=None, corpus_index=None, prefilter_top_n=None,
+                       dedup_threshold=None, refine_top_k=None):
+    """Runs one collection end to end and returns the output path (None if skipped)."""
+    job = start_collection(collection_path, output_format, refine_top_k)
+    if job is None:
+        return None
 
-        if not sections:
-            continue
+    try:
+        # 🔄 Process PDFs and extract relevant sections
+        store = process_pdfs(collection_path, job["input_documents"], extraction_cache, executor,
+                             job["subsection_writer"], outline_top_k, dedup_threshold)
+        return finish_collection(job, store, embedding_cache, corpus_index, prefilter_top_n)
+    except BaseException:
+        abort_collection(job)
+        raise
+
+def start_collection(collection_path, output_format=OUTPUT_FORMAT, refine_top_k=None):
+    """
+    Reads the collection's input and returns its job: the paths, documents and
+    queries, with an open JsonlOutputWriter (metadata written) in jsonl mode.
+    Returns None when the collection is skipped.
+
+    job["subsection_writer"] is the writer build_section_store writes the
+    subsection records to; refined records are only known after ranking.
+    """
+    input_json_path = os.path.join(collection_path, "challenge1b_input.json")
+    pdf_dir = os.path.join(collection_path, "PDFs")
 
-        scored_sections = compute_relevance_score(query, sections)
-        ranked_sections = rank_sections(scored_sections)
+    if not os.path.exists(input_json_path) or not os.path.exists(pdf_dir):
+        return None
 
-        final_output = {
-            "input_documents": input_documents,
-            "persona": persona,
-            "job_to_be_done": job,
-            "ranked_sections": ranked_sections,
-            "subsection_analysis": subsection_analysis,
-            "processing_timestamp": datetime.now().isoformat(),
-        }
+    input_documents, queries, multi_query = read_collection_input(input_json_path)
+    if not queries:
+        return None
 
-        with open(output_json_path, "w", encoding="utf-8") as f:
+    job = {
+        "collection": os.path.basename(os.path.normpath(collection_path)),
+        "collection_path": collection_path,
+        "input_documents": input_documents,
+        "queries": queries,
+        "multi_query": multi_query,
+        "output_path": os.path.join(collection_path, "challenge1b_output.json"),
+        "refine_top_k": refine_top_k,
+        "writer": None,
+        "subsection_writer": None,
+    }
+    if output_format == "jsonl":
+        job["output_path"] = os.path.join(collection_path, "challenge1b_output.jsonl")
+        job["writer"] = JsonlOutputWriter(job["output_path"])
+        metadata = {"input_documents": input_documents}
+        if multi_query:
+            metadata["queries"] = [
+                {"persona": persona, "job_to_be_done": job_to_be_done} for persona, job_to_be_done in queries
+            ]
+        else:
+            (metadata["persona"], metadata["job_to_be_done"]), = queries
+        metadata["processing_timestamp"] = datetime.now().isoformat()
+        job["writer"].write("metadata", metadata)
+        if refine_top_k is None:
+            job["subsection_writer"] = job["writer"]
+    return job
+
+def finish_collection(job, store, embedding_cache=None, corpus_index=None, prefilter_top_n=None):
+    """Ranks the job's sections, indexes them and writes the output; returns its path (None if skipped)."""
+    writer = job["writer"]
+    if writer is None and not len(store):
+        return None
+
+    queries, multi_query = job["queries"], job["multi_query"]
+    ranked_per_query = refined_per_query = []
+    if len(store):
+        ranked_per_query, refined_per_query = rank_queries(queries, store, embedding_cache, prefilter_top_n,
+                                                           job["refine_top_k"])
+        if corpus_index is not None:
+            update_corpus_index(corpus_index, job["collection_path"], job["input_documents"], store,
+                                embedding_cache)
+        if embedding_cache is not None:
+            embedding_cache.flush()
+
+    if writer is not None:
+        # Unless refined, subsection records were written per document while extracting
+        for query_index, ranked_sections in enumerate(ranked_per_query):
+            for ranked in ranked_sections:
+                # Multi-query records say which entry of metadata["queries"] they rank for
+                writer.write("ranked_section", {"query": query_index, **ranked} if multi_query else ranked)
+        for query_index, records in enumerate(refined_per_query or []):
+            for record in records:
+                writer.write("subsection_analysis", {"query": query_index, **record} if multi_query else record)
+        writer.close()
+    else:
+        final_output = {"input_documents": job["input_documents"]}
+        if multi_query:
+            final_output["queries"] = [
+                {"persona": persona, "job_to_be_done": job_to_be_done, "ranked_sections": ranked_sections}
+                for (persona, job_to_be_done), ranked_sections in zip(queries, ranked_per_query)
+            ]
+            # Refined records depend on the query, so each query lists its own
+            for entry, records in zip(final_output["queries"], refined_per_query or []):
+                entry["subsection_analysis"] = records
+        else:
+            (persona, job_to_be_done), = queries
+            final_output["persona"] = persona
+            final_output["job_to_be_done"] = job_to_be_done
+            final_output["ranked_sections"] = ranked_per_query[0]
+        if refined_per_query is None:
+            final_output["subsection_analysis"] = list(store.subsection_records())
+        elif not multi_query:
+            final_output["subsection_analysis"] = refined_per_query[0]
+        final_output["processing_timestamp"] = datetime.now().isoformat()
+
+        with open(job["output_path"], "w", encoding="utf-8") as f:
             json.dump(final_output, f, indent=2, ensure_ascii=False)
 
-        print(f"Output written to {output_json_path}")
-
-
+    print(f"Output written to {job['output_path']}")
+    return job["output_path"]
+
+def abort_collection(job):
+    # A run that failed half-way leaves no "end" record behind
+    if job["writer"] is not None:
+        job["writer"].close(complete=False)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Rank the most relevant PDF sections for each collection's persona and job-to-be-done."
+    )
+    parser.add_argument("--input-dir", default=COLLECTIONS_DIR,
+                        help="directory holding one sub-directory per collection (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS,
+                        help="worker processes used for PDF extraction (default: %(default)s)")
+    parser.add_argument("--output-format", choices=["json", "jsonl"], default=OUTPUT_FORMAT,
+                        help="json: one indented file per collection; jsonl: stream records as they "
+                             "are produced (default: %(default)s)")
+    parser.add_argument("--outline-top-k", type=int, default=OUTLINE_TOP_K,
+                        help="stream pages and keep only this many heading candidates per page "
+                             "(default: keep all)")
+    parser.add_argument("--backend", choices=models.SENTENCE_BACKENDS, default=SENTENCE_BACKEND,
+                        help="sentence model backend; int8 is dynamically quantized for faster CPU "
+                             "inference (default: %(default)s)")
+    parser.add_argument("--threads", type=int, default=NUM_THREADS,
+                        help="intra-op threads for the sentence model (default: torch's choice)")
+    parser.add_argument("--dedup", type=float, metavar="THRESHOLD", default=DEDUP_THRESHOLD,
+                        help="fold blocks whose word-shingle Jaccard similarity reaches THRESHOLD (e.g. 0.8) "
+                             "into one, listing the others under its duplicates (default: keep all)")
+    parser.add_argument("--prefilter", type=int, metavar="N", default=PREFILTER_TOP_N,
+                        help="embed only the N best sections per query under BM25; the rest are ranked "
+                             "lexically after them (default: embed every section)")
+    parser.add_argument("--refine", type=int, metavar="K", default=REFINE_TOP_K,
+                        help="list only each query's K best sections under subsection_analysis, refined to "
+                             f"their most query-relevant sentences (at most {REFINE_MAX_CHARS} characters) "
+                             "(default: every section's full text)")
+    parser.add_argument("--pipeline-depth", type=int, default=PIPELINE_DEPTH,
+                        help="collections that may wait between the extract, enrich and rank stages; "
+                             "0 processes collections one after another (default: %(default)s)")
+    parser.add_argument("--index-dir",
+                        help="corpus index of section embeddings; processed collections are appended to it")
+    parser.add_argument("--build-ivf", action="store_true",
+                        help="(re)build the approximate-search partition of --index-dir after indexing")
+    parser.add_argument("--search", metavar="QUERY",
+                        help="query the --index-dir corpus instead of processing collections")
+    parser.add_argument("--top-k", type=int, default=10, help="results returned by --search (default: %(default)s)")
+    parser.add_argument("--approximate", action="store_true",
+                        help="use the IVF partition for --search instead of exact scoring")
+    parser.add_argument("--trace", metavar="PATH",
+                        help="profile the run: write a Chrome/Perfetto trace to PATH and print per-stage "
+                             "timings, work counters and peak memory")
+    parser.add_argument("--serve", action="store_true",
+                        help="keep the models loaded and accept collection jobs over HTTP instead of "
+                             "processing --input-dir once")
+    parser.add_argument("--host", default="127.0.0.1", help="--serve address (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=8080, help="--serve port (default: %(default)s)")
+    parser.add_argument("--socket", metavar="PATH", help="--serve on this Unix socket instead of TCP")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="collection jobs --serve runs at the same time (default: %(default)s)")
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
-    if RUN_PHASE_3:
-        run_phase_3()
+    args = parse_args()
+    tracer = tracing.enable() if args.trace else None
+    models.configure_sentence_backend(args.backend, args.threads)
+    if args.search is not None:
+        if not args.index_dir:
+            raise SystemExit("--search needs --index-dir")
+        results = search_corpus(args.index_dir, args.search, args.top_k, args.approximate)
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+    elif args.serve:
+        from service import run_service
+        pipeline = Pipeline(args.workers, args.output_format, args.outline_top_k, args.index_dir, args.prefilter,
+                            args.dedup, args.refine)
+        try:
+            run_service(pipeline, args.host, args.port, args.socket, args.concurrency)
+        finally:
+            pipeline.close()
+    elif RUN_PHASE_3:
+        run_phase_3(args.input_dir, args.workers, args.output_format, args.outline_top_k,
+                    args.index_dir, args.build_ivf, args.prefilter, args.dedup, args.pipeline_depth, args.refine)
+
+    if tracer is not None:
+        tracer.write_chrome_trace(args.trace)
+        print(f"\n{tracer.summary()}\nTrace written to {args.trace}")
+        tracing.disable()
@@ -0,0 +1,226 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+MANIFEST_FILE = "index.json"
+VECTORS_FILE = "embeddings.f32"
+METADATA_FILE = "sections.jsonl"
+IVF_FILE = "ivf.npz"
+
+# Rows scored per chunk in exact search, so the memmap is never fully loaded
+SEARCH_CHUNK_ROWS = 65536
+
+
+def top_k_indices(scores, k):
+    """Indices of the k highest scores, best first, without sorting everything."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+class CorpusIndex:
+    """
+    Persisted section-embedding index spanning many collections.
+
+    Rows are appended to a raw float32 file (memory-mapped for search) with one
+    JSON line of metadata each (collection, doc, page, section_title). The
+    manifest records every indexed document's content digest, so re-indexing
+    only appends documents that are new or changed; rows of a changed document
+    are tombstoned. Search is exact (chunked matrix-vector product plus
+    argpartition) or approximate through an inverted-file (IVF) partition built
+    with spherical k-means, probing only the lists nearest to the query.
+    """
+
+    def __init__(self, index_dir, model_id):
+        self.index_dir = index_dir
+        self.model_id = model_id
+        self.dim = None
+        self.count = 0
+        self.documents = {}  # "collection/doc" -> {"digest": str, "rows": [int]}
+        self.deleted = set()
+        self.centroids = None
+        self.assignments = None
+        self._metadata = None
+        self._lock = threading.RLock()
+        self._load()
+
+    def _path(self, name):
+        return os.path.join(self.index_dir, name)
+
+    ### PERSISTENCE ###
+
+    def _load(self):
+        if not os.path.exists(self._path(MANIFEST_FILE)):
+            self._drop_unsaved_rows()
+            return
+        with open(self._path(MANIFEST_FILE), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("model_id") != self.model_id:
+            raise ValueError(
+                f"Index at {self.index_dir} was built with {manifest.get('model_id')}, not {self.model_id}"
+            )
+        self.dim = manifest["dim"]
+        self.count = manifest["count"]
+        self.documents = manifest["documents"]
+        self.deleted = set(manifest.get("deleted", []))
+        self._drop_unsaved_rows()
+
+        if os.path.exists(self._path(IVF_FILE)):
+            ivf = np.load(self._path(IVF_FILE))
+            self.centroids = ivf["centroids"]
+            self.assignments = ivf["assignments"]
+
+    def _drop_unsaved_rows(self):
+        # Rows appended after the last save (e.g. by a run that died before
+        # saving) are not in the manifest; the next add_document numbers its
+        # rows from self.count, so they must not stay in the files.
+        vectors_path, metadata_path = self._path(VECTORS_FILE), self._path(METADATA_FILE)
+        if os.path.exists(vectors_path):
+            size = self.count * (self.dim or 0) * np.dtype(np.float32).itemsize
+            if os.path.getsize(vectors_path) > size:
+                os.truncate(vectors_path, size)
+        if os.path.exists(metadata_path):
+            with open(metadata_path, "r+b") as f:
+                for _ in range(self.count):
+                    if not f.readline():
+                        break
+                if f.read(1):
+                    f.truncate(f.tell() - 1)
+
+    def save(self):
+        with self._lock:
+            os.makedirs(self.index_dir, exist_ok=True)
+            if self.centroids is not None:
+                tmp_path = self._path(IVF_FILE + ".tmp.npz")
+                np.savez(tmp_path, centroids=self.centroids, assignments=self.assignments)
+                os.replace(tmp_path, self._path(IVF_FILE))
+
+            manifest = {
+                "model_id": self.model_id,
+                "dim": self.dim,
+                "count": self.count,
+                "documents": self.documents,
+                "deleted": sorted(self.deleted),
+            }
+            tmp_path = self._path(MANIFEST_FILE + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+            os.replace(tmp_path, self._path(MANIFEST_FILE))
+
+    def vectors(self):
+        if not self.count:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return np.memmap(self._path(VECTORS_FILE), dtype=np.float32, mode="r", shape=(self.count, self.dim))
+
+    def metadata(self, row):
+        if self._metadata is None:
+            with open(self._path(METADATA_FILE), "r", encoding="utf-8") as f:
+                self._metadata = [json.loads(line) for line in f]
+        return self._metadata[row]
+
+    ### INCREMENTAL UPDATES ###
+
+    def is_current(self, collection, doc, digest):
+        entry = self.documents.get(f"{collection}/{doc}")
+        return entry is not None and entry["digest"] == digest
+
+    def add_document(self, collection, doc, digest, sections, embeddings):
+        """
+        Appends one document's sections (dicts with page and section_title) and
+        their L2-normalised embeddings; an older version of it is tombstoned.
+        """
+        with self._lock:
+            key = f"{collection}/{doc}"
+            previous = self.documents.get(key)
+            if previous is not None:
+                self.deleted.update(previous["rows"])
+
+            embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+            if len(sections):
+                if self.dim is None:
+                    self.dim = embeddings.shape[1]
+                elif embeddings.shape[1] != self.dim:
+                    raise ValueError(f"Embedding dimension {embeddings.shape[1]} does not match index ({self.dim})")
+
+            os.makedirs(self.index_dir, exist_ok=True)
+            with open(self._path(VECTORS_FILE), "ab") as f:
+                f.write(embeddings.tobytes())
+            with open(self._path(METADATA_FILE), "a", encoding="utf-8") as f:
+                for section in sections:
+                    record = {
+                        "collection": collection,
+                        "doc": doc,
+                        "page": section["page"],
+                        "section_title": section["section_title"],
+                    }
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    if self._metadata is not None:
+                        self._metadata.append(record)
+
+            rows = list(range(self.count, self.count + len(sections)))
+            self.count += len(sections)
+            self.documents[key] = {"digest": digest, "rows": rows}
+
+            if self.centroids is not None and len(sections):
+                # New rows join the nearest existing list; rebuild for a fresh partition
+                self.assignments = np.concatenate([self.assignments, (embeddings @ self.centroids.T).argmax(axis=1)])
+
+    ### APPROXIMATE SEARCH STRUCTURE ###
+
+    def build_ivf(self, n_lists=None, iterations=10, seed=0):
+        vectors = np.asarray(self.vectors())
+        if not len(vectors):
+            return
+        n_lists = n_lists or max(1, int(np.sqrt(len(vectors))))
+        n_lists = min(n_lists, len(vectors))
+
+        rng = np.random.default_rng(seed)
+        centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = (vectors @ centroids.T).argmax(axis=1)
+            for list_id in range(n_lists):
+                members = vectors[assignments == list_id]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[list_id] = centroid / max(np.linalg.norm(centroid), 1e-12)
+
+        self.centroids = centroids.astype(np.float32)
+        self.assignments = (vectors @ self.centroids.T).argmax(axis=1)
+
+    ### SEARCH ###
+
+    def search(self, query_embedding, k=10, approximate=False, n_probe=8):
+        """Returns [(row, score)] for the k best live rows, best first."""
+        query_embedding = np.asarray(query_embedding, dtype=np.float32)
+        vectors = self.vectors()
+        if not len(vectors):
+            return []
+
+        if approximate and self.centroids is not None:
+            probes = top_k_indices(self.centroids @ query_embedding, n_probe)
+            candidates = np.flatnonzero(np.isin(self.assignments, probes))
+            scores = np.asarray(vectors[candidates]) @ query_embedding
+            return self._best(candidates, scores, k)
+
+        best_rows, best_scores = [], []
+        for start in range(0, len(vectors), SEARCH_CHUNK_ROWS):
+            chunk = np.asarray(vectors[start:start + SEARCH_CHUNK_ROWS])
+            rows = np.arange(start, start + len(chunk))
+            for row, score in self._best(rows, chunk @ query_embedding, k):
+                best_rows.append(row)
+                best_scores.append(score)
+        return self._best(np.asarray(best_rows), np.asarray(best_scores), k)
+
+    def _best(self, rows, scores, k):
+        if self.deleted:
+            live = ~np.isin(rows, list(self.deleted))
+            rows, scores = rows[live], scores[live]
+        top = top_k_indices(scores, k)
+        return [(int(rows[i]), float(scores[i])) for i in top]
+
+    def __len__(self):
+        return self.count - len(self.deleted)
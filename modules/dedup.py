@@ -0,0 +1,86 @@
+import zlib
+
+import numpy as np
+
+from modules.lexical import TOKEN_RE
+
+SHINGLE_SIZE = 5  # words per shingle
+NUM_PERM = 64  # MinHash permutations, split into LSH bands by rows_per_band
+# Largest prime below 2**32: with a, x < 2**32, a * x fits in 64 bits exactly
+PRIME = 4294967291
+
+_rng = np.random.default_rng(0)
+_PERM_A = _rng.integers(1, PRIME, NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, PRIME, NUM_PERM, dtype=np.uint64)
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Hashed word n-grams of the text (the whole text when it is shorter)."""
+    words = TOKEN_RE.findall(text.lower())
+    grams = {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+    return {zlib.crc32(gram.encode("utf-8")) for gram in grams if gram}
+
+
+def minhash(shingle_set):
+    if not shingle_set:
+        return np.full(NUM_PERM, np.iinfo(np.uint64).max, dtype=np.uint64)
+    hashes = np.fromiter(shingle_set, dtype=np.uint64, count=len(shingle_set)) % np.uint64(PRIME)
+    # (a * x + b) mod p for every shingle and permutation at once
+    values = (hashes[:, None] * _PERM_A % np.uint64(PRIME) + _PERM_B) % np.uint64(PRIME)
+    return values.min(axis=0)
+
+
+def rows_per_band(threshold, num_perm=NUM_PERM):
+    """
+    Widest band for which pairs somewhat below the threshold still collide
+    often: with b bands of r rows the LSH S-curve rises at (1/b) ** (1/r).
+    """
+    best = 1
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows == 0 and (rows / num_perm) ** (1 / rows) <= threshold - 0.1:
+            best = rows
+    return best
+
+
+def group_near_duplicates(texts, threshold=0.8):
+    """
+    Groups texts whose word-shingle Jaccard similarity reaches threshold.
+
+    Candidate pairs come from MinHash LSH; each is confirmed with the exact
+    Jaccard of the shingle sets, so the threshold is applied precisely.
+    Returns one list of positions per group of two or more, each sorted so
+    the first position is the group's representative.
+    """
+    shingle_sets = [shingles(text) for text in texts]
+    signatures = [minhash(s) for s in shingle_sets]
+    rows = rows_per_band(threshold)
+
+    parent = list(range(len(texts)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    checked = set()
+    for start in range(0, NUM_PERM, rows):
+        buckets = {}
+        for i, signature in enumerate(signatures):
+            if shingle_sets[i]:
+                buckets.setdefault(signature[start:start + rows].tobytes(), []).append(i)
+        for members in buckets.values():
+            for position, j in enumerate(members):
+                for i in members[:position]:
+                    if (i, j) in checked or find(i) == find(j):
+                        continue
+                    checked.add((i, j))
+                    a, b = shingle_sets[i], shingle_sets[j]
+                    if len(a & b) >= threshold * len(a | b):
+                        root_i, root_j = find(i), find(j)
+                        parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    groups = {}
+    for i in range(len(texts)):
+        groups.setdefault(find(i), []).append(i)
+    return [members for members in groups.values() if len(members) > 1]
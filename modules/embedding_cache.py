@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+INDEX_FILE = "index.json"
+VECTORS_FILE = "vectors.f32"
+
+
+class EmbeddingCache:
+    """
+    On-disk, content-addressed store of text embeddings.
+
+    Each entry is keyed by a hash of the model id and the text. Vectors live
+    in a fixed-size memory-mapped float32 array, so a warm start only reads the
+    small JSON index and pages in the rows that are actually looked up. When
+    the store is full the least recently used entries are evicted.
+
+    A store is meant to be used by one process at a time; within it, calls
+    are serialised so worker threads can share it.
+    """
+
+    def __init__(self, cache_dir, model_id, max_entries=100_000):
+        self.model_id = model_id
+        self.max_entries = max_entries
+        model_slug = hashlib.sha1(model_id.encode("utf-8")).hexdigest()[:16]
+        self.cache_dir = os.path.join(cache_dir, model_slug)
+        self.index_path = os.path.join(self.cache_dir, INDEX_FILE)
+        self.vectors_path = os.path.join(self.cache_dir, VECTORS_FILE)
+
+        self.dim = None
+        self.clock = 0
+        self.entries = {}  # key -> [slot, last_used]
+        self.free_slots = []
+        self._vectors = None
+        self._dirty = False
+        self._lock = threading.RLock()
+        self._load_index()
+
+    ### INDEX ###
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path) or not os.path.exists(self.vectors_path):
+            return
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        # A store created with another capacity is rebuilt rather than resized
+        if index.get("model_id") != self.model_id or index.get("capacity") != self.max_entries:
+            return
+
+        self.dim = index["dim"]
+        self.clock = index.get("clock", 0)
+        self.entries = index.get("entries", {})
+        used = {slot for slot, _ in self.entries.values()}
+        self.free_slots = [slot for slot in range(self.max_entries - 1, -1, -1) if slot not in used]
+
+    def _open_vectors(self, dim):
+        if self._vectors is not None:
+            return self._vectors
+        if self.dim is None:
+            self.dim = dim
+        os.makedirs(self.cache_dir, exist_ok=True)
+        shape = (self.max_entries, self.dim)
+        if self.entries and os.path.exists(self.vectors_path):
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=shape)
+        else:
+            self.entries = {}
+            self.free_slots = list(range(self.max_entries - 1, -1, -1))
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="w+", shape=shape)
+        return self._vectors
+
+    def key(self, text):
+        return hashlib.sha256(f"{self.model_id}\n{text}".encode("utf-8")).hexdigest()
+
+    ### LOOKUP / INSERT ###
+
+    def get_many(self, texts):
+        """Returns {position_in_texts: vector} for every text already cached."""
+        with self._lock:
+            if not self.entries:
+                return {}
+            vectors = self._open_vectors(self.dim)
+            self.clock += 1
+            hits = {}
+            for i, text in enumerate(texts):
+                entry = self.entries.get(self.key(text))
+                if entry is None:
+                    continue
+                entry[1] = self.clock
+                hits[i] = np.array(vectors[entry[0]])
+            if hits:
+                self._dirty = True
+            return hits
+
+    def put_many(self, texts, embeddings):
+        with self._lock:
+            if not len(texts):
+                return
+            embeddings = np.asarray(embeddings, dtype=np.float32)
+            if self.dim is not None and embeddings.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {embeddings.shape[1]} does not match cache ({self.dim})")
+            vectors = self._open_vectors(embeddings.shape[1])
+            self.clock += 1
+
+            for text, embedding in zip(texts, embeddings):
+                key = self.key(text)
+                entry = self.entries.get(key)
+                if entry is None:
+                    if not self.free_slots:
+                        self._evict()
+                    entry = self.entries[key] = [self.free_slots.pop(), self.clock]
+                entry[1] = self.clock
+                vectors[entry[0]] = embedding
+            self._dirty = True
+
+    def _evict(self):
+        # Free the least recently used tenth in one go to amortise the sort
+        count = max(1, self.max_entries // 10)
+        victims = sorted(self.entries.items(), key=lambda item: item[1][1])[:count]
+        for key, _ in victims:
+            del self.entries[key]
+        # The index on disk still maps the victims to their slots; save it
+        # before the slots are overwritten, or a run that exits without
+        # flushing would serve the new vectors for the evicted texts
+        self._dirty = True
+        self.flush()
+        self.free_slots.extend(slot for _, (slot, _) in victims)
+
+    def flush(self):
+        with self._lock:
+            if not self._dirty or self._vectors is None:
+                return
+            self._vectors.flush()
+            index = {
+                "model_id": self.model_id,
+                "dim": self.dim,
+                "capacity": self.max_entries,
+                "clock": self.clock,
+                "entries": self.entries,
+            }
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(index, f)
+            os.replace(tmp_path, self.index_path)
+            self._dirty = False
+
+    def __len__(self):
+        return len(self.entries)
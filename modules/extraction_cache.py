@@ -0,0 +1,53 @@
+import hashlib
+import json
+import os
+
+
+def file_digest(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """
+    Per-document store of extracted section blocks.
+
+    Entries are keyed by the SHA-256 of the PDF's bytes and stamped with the
+    extractor version, so renamed files still hit and any change to the
+    extraction logic invalidates everything written before it.
+    """
+
+    def __init__(self, cache_dir, version):
+        self.cache_dir = cache_dir
+        self.version = version
+
+    def _path(self, digest):
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}.json")
+
+    def load(self, digest, doc_name):
+        path = self._path(digest)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("version") != self.version:
+            return None
+
+        blocks = entry["blocks"]
+        for block in blocks:
+            block["doc"] = doc_name
+        return blocks
+
+    def store(self, digest, blocks):
+        path = self._path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.version, "blocks": blocks}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
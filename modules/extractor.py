@@ -1,17 +1,20 @@
 import fitz
+import heapq
 import re
-import unicodedata
 from collections import defaultdict
 from difflib import SequenceMatcher
-from nltk import pos_tag, word_tokenize
-import nltk
-
-import spacy
 from collections import Counter
-nlp = spacy.load("en_core_web_sm")
 
-nltk.download('punkt', quiet=True)
-nltk.download('averaged_perceptron_tagger', quiet=True)
+import numpy as np
+
+from modules import tracing
+from modules.filters import mentions_measurement, starts_like_instruction
+from modules.models import get_model
+from modules.unicode_tables import LATIN, SCRIPT_NAMES, script_ranges
+
+# Stamp for cached extraction results; bump whenever the blocks produced by
+# outline extraction, outline filtering, block matching or enrichment change.
+EXTRACTOR_VERSION = "2"
 
 ### UTILITIES ###
 
@@ -34,41 +37,76 @@ def fix_spacing(text):
     text = re.sub(r'([A-Z]{2,})([A-Z][a-z])', r'\1 \2', text)
     return text
 
-def detect_script(text):
-    scripts = defaultdict(int)
-    for char in text:
-        if char.isalpha():
-            name = unicodedata.name(char, "")
-            if "LATIN" in name: scripts["Latin"] += 1
-            elif "CYRILLIC" in name: scripts["Cyrillic"] += 1
-            elif "CJK" in name or "HIRAGANA" in name: scripts["Japanese"] += 1
-            elif "HANGUL" in name: scripts["Korean"] += 1
-            elif "ARABIC" in name: scripts["Arabic"] += 1
-            elif "DEVANAGARI" in name: scripts["Devanagari"] += 1
-    return max(scripts, key=scripts.get) if scripts else "Unknown"
-
-def is_likely_instruction_or_ingredient(text, tokens, tags):
-    """Reject headings that sound like ingredient instructions or measurements"""
-    text_lower = text.lower()
-    
-    # Common culinary noise starters
-    skip_starts = [
-        "pinch of", "salt and pepper", "toppings:", "instructions:", "optional:", "preheat", 
-        "add ", "bake ", "stir ", "pour ", "serve", "combine", "drizzle", "cook"
-    ]
-    if any(text_lower.startswith(phrase) for phrase in skip_starts):
-        return True
-
-    # Likely an ingredient line if it has too many numbers and units
-    if re.search(r"\d+/?\d*\s?(cups?|tablespoons?|tbsp|tsp|grams?|oz|ml|liters?)", text_lower):
-        return True
+INLINE_COLON_RE = re.compile(r".*:[^\s]")  # tips like "Make a Packing List:Bring a pen"
 
+def lacks_nouns(tokens, tags):
     # Overly short and lacks noun tags (not informative heading)
     noun_tags = [tag for _, tag in tags if tag.startswith('NN')]
-    if len(tokens) < 4 and len(noun_tags) < 2:
-        return True
-
-    return False
+    return len(tokens) < 4 and len(noun_tags) < 2
+
+### HEADING CANDIDATE CASCADE ###
+
+# Rejection stages in evaluation order. The tag-free stages only look at the
+# text, its size and its token count; lines that survive them are POS-tagged
+# in one batch per page before the tag stages run.
+TAG_FREE_STAGES = (
+    "empty", "short_or_repetitive", "zero_size", "lowercase_start", "inline_colon",
+    "instruction_start", "measurement", "no_tokens", "too_long", "short_plain",
+    "sentence_like",
+)
+TAG_STAGES = ("gerund", "few_nouns")
+FILTER_STAGES = TAG_FREE_STAGES + TAG_STAGES
+
+def prefilter_line(line, word_tokenize):
+    """
+    Runs the tag-free checks on a merged line.
+    Returns (rejecting_stage, None) or (None, candidate).
+    """
+    if not line["sizes"]:
+        return "empty", None
+
+    text = fix_spacing(clean_ocr_artifacts(collapse_repeats(line["text"]))).strip()
+    if len(text) < 3 or is_repetitive(text):
+        return "short_or_repetitive", None
+
+    avg_size = sum(line["sizes"]) / len(line["sizes"])
+    if avg_size == 0:
+        return "zero_size", None
+    if text[0].islower():
+        return "lowercase_start", None
+    if INLINE_COLON_RE.match(text):
+        return "inline_colon", None
+
+    if starts_like_instruction(text):
+        return "instruction_start", None
+    if mentions_measurement(text):
+        return "measurement", None
+
+    tokens = word_tokenize(text)
+    if not tokens:
+        return "no_tokens", None
+    if len(tokens) > 14:  # too long to be a heading
+        return "too_long", None
+
+    bold = any(is_bold(f) for f in line["flags"])
+    if len(tokens) < 3 and not bold and avg_size < 12:
+        return "short_plain", None
+    if text.endswith('.') and 3 <= len(tokens) <= 6:
+        return "sentence_like", None
+
+    return None, {"text": text, "avg_size": avg_size, "bold": bold, "tokens": tokens, "y0": line["y0"]}
+
+def reject_by_tags(candidate, tags):
+    if any(tag.startswith("VBG") for _, tag in tags):  # e.g. 'Cooking', 'Traveling'
+        return "gerund"
+    if lacks_nouns(candidate["tokens"], tags):
+        return "few_nouns"
+    return None
+
+def format_filter_report(report):
+    rejected = ", ".join(f"{stage}={report[stage]}" for stage in FILTER_STAGES if report.get(stage))
+    return (f" Heading filter: {report['lines']} lines, {report['pos_tag']} POS-tagged, "
+            f"{report['accepted']} kept ({rejected})")
 
 
 def merge_spans_to_lines(blocks):
@@ -124,88 +162,220 @@ def group_multiline_headings(lines):
         i = j
     return grouped
 
-### MAIN OUTLINE EXTRACTOR ###
+### DOCUMENT PARSER ###
+
+def iter_pages(pdf_path, text_sink=None):
+    """
+    Yields one record per page. Each page's text layer is built once and
+    shared by the layout ("dict") and plain-text extractions.
+
+    text_sink: optional list that receives every page's plain text, so a
+    caller streaming the pages keeps the text without holding the layouts.
+    """
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            textpage = page.get_textpage(flags=fitz.TEXTFLAGS_DICT)
+            text = page.get_text("text", textpage=textpage)
+            if text_sink is not None:
+                text_sink.append(text)
+            tracing.count("pages")
+            yield {
+                "number": page.number + 1,
+                "height": page.rect.height,
+                "blocks": page.get_text("dict", textpage=textpage)["blocks"],
+                "text": text,
+            }
+
+def parse_document(pdf_path):
+    return list(iter_pages(pdf_path))
+
+### VECTORIZED LINE SCORING ###
+
+def script_ids(code_points):
+    """Script id (index into SCRIPT_NAMES) of every code point in the array."""
+    starts, ids = script_ranges()
+    return ids[np.searchsorted(starts, code_points, side="right") - 1]
+
+def latin_dominant(code_points, segments, n_lines):
+    """
+    Per line, whether Latin is the dominant script: Latin has the most
+    letters and, on a tie, appeared before every other tied script.
+    """
+    line_script_ids = script_ids(code_points)
+    tracked = np.flatnonzero(line_script_ids)
+    n_scripts = len(SCRIPT_NAMES)
+
+    keys = segments[tracked] * n_scripts + line_script_ids[tracked]
+    counts = np.bincount(keys, minlength=n_lines * n_scripts).reshape(n_lines, n_scripts)
+    first_seen = np.full(n_lines * n_scripts, np.iinfo(np.int64).max, dtype=np.int64)
+    unique_keys, first_index = np.unique(keys, return_index=True)
+    first_seen[unique_keys] = tracked[first_index]
+    first_seen = first_seen.reshape(n_lines, n_scripts)
+
+    latin_count = counts[:, LATIN:LATIN + 1]
+    beaten = (counts > latin_count) | ((counts == latin_count) & (first_seen < first_seen[:, LATIN:LATIN + 1]))
+    beaten[:, [0, LATIN]] = False
+    return (latin_count[:, 0] > 0) & ~beaten.any(axis=1)
+
+def score_heading_lines(lines):
+    """
+    Heading scores for accepted candidate lines, computed column-wise in one
+    NumPy pass. Bonuses are added in the same order as the scalar formula so
+    the float results are identical:
+    size + 4 * cap_ratio + bold + script + top-of-page + short + colon + title case.
+    """
+    n_lines = len(lines)
+    if not n_lines:
+        return np.zeros(0)
+
+    texts = [line["text"] for line in lines]
+    lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=n_lines)
+    code_points = np.frombuffer("".join(texts).encode("utf-32-le"), dtype=np.uint32)
+    segments = np.repeat(np.arange(n_lines), lengths)
+
+    # Capital ratio: str.isupper is evaluated once per distinct code point
+    unique, inverse = np.unique(code_points, return_inverse=True)
+    unique_upper = np.fromiter((chr(c).isupper() for c in unique.tolist()), dtype=bool, count=len(unique))
+    upper_counts = np.bincount(segments, weights=unique_upper[inverse], minlength=n_lines)
+    cap_ratio = upper_counts / np.maximum(lengths, 1)
+
+    sizes = np.fromiter((line["avg_size"] for line in lines), dtype=np.float64, count=n_lines)
+    bold = np.fromiter((line["bold"] for line in lines), dtype=bool, count=n_lines)
+    y0 = np.fromiter((line["y0"] for line in lines), dtype=np.float64, count=n_lines)
+    token_counts = np.fromiter((len(line["tokens"]) for line in lines), dtype=np.int64, count=n_lines)
+    ends_with_colon = np.fromiter((text.endswith(":") for text in texts), dtype=bool, count=n_lines)
+    title_case = np.fromiter((text.istitle() for text in texts), dtype=bool, count=n_lines)
+
+    score = sizes + 4 * cap_ratio
+    score = score + np.where(bold, 5, 0)
+    score = score + np.where(latin_dominant(code_points, segments, n_lines), 0, 3)
+    score = score + np.where(y0 < 300, 3, 0)
+    score = score + np.where(token_counts <= 10, 2, 0)
+    score = score + np.where(ends_with_colon, 2, 0)
+    score = score + np.where(title_case, 1, 0)
+    return score
+
+def build_heading_candidates(lines, possible_titles):
+    candidates = []
+    for line, score in zip(lines, score_heading_lines(lines).tolist()):
+        candidates.append({
+            "text": line["text"],
+            "page": line["page"],
+            "size": line["avg_size"],
+            "bold": line["bold"],
+            "y0": line["y0"],
+            "score": score
+        })
 
-def extract_outline(pdf_path):
-    print(f"\n Extracting from: {pdf_path}")
-    doc = fitz.open(pdf_path)
-    candidate_headings, possible_titles = [], []
-    font_sizes_by_freq = defaultdict(int)
-    base_font_size = 12
+        # Capture potential document title
+        if line["title_eligible"]:
+            possible_titles.append((score, line["text"]))
+    return candidates
 
-    for page_number, page in enumerate(doc, start=1):
-        blocks = page.get_text("dict")["blocks"]
-        lines = group_multiline_headings(merge_spans_to_lines(blocks))
+### MAIN OUTLINE EXTRACTOR ###
 
+class FontSizeStats:
+    """
+    Histogram of rounded candidate font sizes with its mode kept up to date.
+
+    Matches taking max() over the whole histogram after every update (ties go
+    to the size seen first, non-positive sizes are ignored) in O(1) per line.
+    """
+
+    def __init__(self, default=12):
+        self.default = default
+        self.counts = {}
+        self.first_seen = {}
+        self.mode = None
+
+    def add(self, size):
+        key = round(size)
+        if key not in self.counts:
+            self.counts[key] = 0
+            self.first_seen[key] = len(self.first_seen)
+        self.counts[key] += 1
+        if key <= 0 or key == self.mode:
+            return
+
+        count = self.counts[key]
+        mode_count = self.counts[self.mode] if self.mode is not None else 0
+        if count > mode_count or (count == mode_count and self.first_seen[key] < self.first_seen[self.mode]):
+            self.mode = key
+
+    @property
+    def base_size(self):
+        return self.mode if self.mode is not None else self.default
+
+def heading_sort_key(h):
+    return (-h["score"], -h["size"])
+
+def extract_outline(pdf_path, pages=None, top_k=None):
+    """
+    top_k: when set, only the top_k heading candidates of each page are kept
+    (ranked as in the final selection), so memory stays flat however long the
+    document is. Pass pages as a generator (iter_pages) to stream the parse as
+    well. Level assignment uses the document-wide font statistics either way.
+    """
+    print(f"\n Extracting from: {pdf_path}")
+    word_tokenize, _, pos_tag_sents = get_model("nltk")
+    if pages is None:
+        pages = iter_pages(pdf_path)
+    candidate_headings, possible_titles, accepted_lines = [], [], []
+    report = Counter()
+    font_stats = FontSizeStats()
+
+    for page in pages:
+        page_number = page["number"]
+        lines = group_multiline_headings(merge_spans_to_lines(page["blocks"]))
+
+        # ❌ Filter bad candidates: cheap checks first, then tag the survivors
+        survivors = []
         for line in lines:
-            raw_text = line["text"]
-            if not line["sizes"]:
-                continue
-
-            text = fix_spacing(clean_ocr_artifacts(collapse_repeats(raw_text))).strip()
-            if len(text) < 3 or is_repetitive(text):
-                continue
-
-            avg_size = sum(line["sizes"]) / len(line["sizes"])
-            if avg_size == 0:
-                continue
-
-            bold = any(is_bold(f) for f in line["flags"])
-            tokens = word_tokenize(text)
-            if not tokens:
-                continue
-            tags = pos_tag(tokens)
-            y0 = line["y0"]
+            report["lines"] += 1
+            stage, candidate = prefilter_line(line, word_tokenize)
+            if stage:
+                report[stage] += 1
+            else:
+                survivors.append(candidate)
 
-            # ❌ Filter bad candidates
-            if len(tokens) < 3 and not bold and avg_size < 12:
-                continue
-            if text.endswith('.') and 3 <= len(tokens) <= 6:
-                continue
-            if any(tag.startswith("VBG") for _, tag in tags):  # e.g. 'Cooking', 'Traveling'
-                continue
-            if text[0].islower():
-                continue
-            if len(tokens) > 14:  # too long to be a heading
-                continue
-            if re.match(r".*:[^\s]", text):  # tips like "Make a Packing List:Bring a pen"
-                continue
-            if is_likely_instruction_or_ingredient(text, tokens, tags):
+        if not survivors:
+            continue
+        page_lines = []
+        report["pos_tag"] += len(survivors)
+        tracing.count("pos_tag_calls")
+        page_tags = pos_tag_sents([candidate["tokens"] for candidate in survivors])
+
+        for candidate, tags in zip(survivors, page_tags):
+            stage = reject_by_tags(candidate, tags)
+            if stage:
+                report[stage] += 1
                 continue
+            report["accepted"] += 1
+
+            font_stats.add(candidate["avg_size"])
+            candidate["page"] = page_number
+            candidate["title_eligible"] = (
+                page_number == 1 and candidate["y0"] < page["height"] * 0.2 and len(candidate["tokens"]) <= 10
+            )
+            page_lines.append(candidate)
+
+        if top_k is not None:
+            # Same order as the final selection, so ties keep line order
+            page_candidates = build_heading_candidates(page_lines, possible_titles)
+            candidate_headings.extend(heapq.nsmallest(top_k, page_candidates, key=heading_sort_key))
+        else:
+            accepted_lines.extend(page_lines)
 
-            font_sizes_by_freq[round(avg_size)] += 1
-            valid_sizes = [(k, v) for k, v in font_sizes_by_freq.items() if k > 0]
-            base_font_size = max(valid_sizes, key=lambda x: x[1])[0] if valid_sizes else 12
-
-            cap_ratio = sum(1 for c in text if c.isupper()) / max(len(text), 1)
-            script = detect_script(text)
-            script_bonus = 3 if script != "Latin" else 0
-
-            # ✅ Improved scoring
-            score = avg_size + (4 * cap_ratio) + (5 if bold else 0) + script_bonus
-            if y0 < 300: score += 3
-            if len(tokens) <= 10: score += 2
-            if text.endswith(":"): score += 2
-            if text.istitle(): score += 1
-
-            candidate_headings.append({
-                "text": text,
-                "page": page_number,
-                "size": avg_size,
-                "bold": bold,
-                "y0": y0,
-                "score": score
-            })
-
-            # Capture potential document title
-            if page_number == 1 and y0 < page.rect.height * 0.2 and len(tokens) <= 10:
-                possible_titles.append((score, text))
+    # ✅ Score every accepted line of the document in one vectorized pass
+    if top_k is None:
+        candidate_headings = build_heading_candidates(accepted_lines, possible_titles)
 
     outline = []
     used_texts = set()
     page_heading_count = defaultdict(int)
 
-    for h in sorted(candidate_headings, key=lambda x: (-x["score"], -x["size"])):
+    base_font_size = font_stats.base_size
+    for h in sorted(candidate_headings, key=heading_sort_key):
         if h["text"] in used_texts or page_heading_count[h["page"]] >= 5:
             continue
 
@@ -242,74 +412,113 @@ def extract_outline(pdf_path):
         next((h["text"] for h in outline if h["level"] == "H1"), outline[0]["text"] if outline else "UNKNOWN")
     )
 
-    return {"title": title, "outline": outline}
-
-### OUTLINE FILTER (PHASE 1 POST-PROCESSING) ###
-
-def refine_outline_structure(outlines):
-    def score(text):
-        score = 0
-        words = text.strip().split()
-        wc, cc = len(words), len(text)
-        if wc < 2 or cc < 10: score += 2
-        if text.islower() and wc > 6: score += 1
-        if text.isupper() and wc > 4: score += 1
-        if re.search(r"^\d+(\.|\))?\s?", text): score += 2
-        if re.search(r"\b\d+/?\d*\s?(cups?|tablespoons?|tbsp|tsp|grams?|oz|ml|liters?)\b", text, re.IGNORECASE): score += 2
-        if sum(c.isdigit() for c in text) / (sum(c.isalpha() for c in text) or 1) > 0.3: score += 1
-        if re.match(r"^[•\-\*\u2022]+\s", text): score += 1
-        if text.count(",") >= 3 and ":" not in text: score += 1
-        if wc > 25 and ":" not in text: score += 2
-        if text.endswith(".") and ":" not in text: score += 1
-        if re.match(r"^(Add|Pour|Top|Stir|Crack|Serve|Preheat|Place|Spread|Press|Heat|Combine|"
-                    r"Bake|Mix|Whisk|Cook|Boil|Grease|Remove|Slice|Chop|Set|Let|Transfer|Layer|Use|Keep|Bring)\b", text, re.IGNORECASE): score += 2
-        if re.match(r"^[A-Z][a-z]+\s(and|or)?\s?(pepper|salt|oil|egg|onion|cheese|spinach|bread|fruit|honey)\b", text, re.IGNORECASE):
-            if wc < 5: score += 2
-        return score
-
-    seen, clean = set(), []
-    for item in outlines:
-        t = item["text"].strip()
-        if t not in seen and score(t) == 0:
-            clean.append(item)
-            seen.add(t)
-    return clean
+    print(format_filter_report(report))
+    tracing.count("lines", report["lines"])
+    tracing.count("pos_tagged_lines", report["pos_tag"])
+    tracing.count("heading_candidates", len(candidate_headings))
+    tracing.count("outline_headings", len(outline))
+    return {"title": title, "outline": outline, "filter_report": dict(report)}
 
 ### PHASE 2: BLOCK EXTRACTION with FUZZY MATCHING ###
 
-def token_overlap_ratio(a, b):
-    set_a = set(a.lower().split())
-    set_b = set(b.lower().split())
-    if not set_a or not set_b:
-        return 0
-    return len(set_a & set_b) / len(set_a | set_b)
+# Minimum hybrid score for a heading to be matched to a page line
+MATCH_THRESHOLD = 0.68
+
+class PageLineIndex:
+    """
+    Token inverted index over the "line + next line" windows of one page.
+
+    The hybrid score is 0.6 * fuzzy + 0.4 * token_overlap with fuzzy <= 1, so a
+    window sharing no token with the heading can never reach the threshold.
+    Only windows found through the index are scored, and SequenceMatcher's
+    cheap upper bounds prune most of those before the full ratio is computed.
+    """
+
+    def __init__(self, page_text):
+        self.lines = page_text.split('\n')
+        self.windows, self.token_sets = [], []
+        self.postings = defaultdict(list)
+        self._matchers = {}
+
+        for idx in range(len(self.lines)):
+            line = self.lines[idx].strip()
+            next_line = self.lines[idx + 1].strip() if idx + 1 < len(self.lines) else ""
+            window = f"{line} {next_line}".strip().lower()
+            tokens = set(window.split())
+            self.windows.append(window)
+            self.token_sets.append(tokens)
+            for token in tokens:
+                self.postings[token].append(idx)
+
+    def _matcher(self, idx):
+        # SequenceMatcher caches its analysis of the second sequence, so one
+        # matcher per window is reused for every heading on the page.
+        matcher = self._matchers.get(idx)
+        if matcher is None:
+            matcher = self._matchers[idx] = SequenceMatcher(None, "", self.windows[idx])
+        return matcher
+
+    @staticmethod
+    def _cannot_win(upper_bound, best_score):
+        return upper_bound < MATCH_THRESHOLD or upper_bound <= best_score
+
+    def best_match(self, title):
+        """
+        Returns (best_idx, best_score) exactly as a full scan would whenever the
+        best score reaches MATCH_THRESHOLD; below it the match is discarded anyway.
+        """
+        title_lower = title.lower()
+        title_tokens = set(title_lower.split())
+        best_idx, best_score = -1, 0
+        if not title_tokens:
+            return best_idx, best_score
+
+        candidates = sorted({idx for token in title_tokens for idx in self.postings.get(token, ())})
+        bounded = full = 0
+        for idx in candidates:
+            window_tokens = self.token_sets[idx]
+            token = len(title_tokens & window_tokens) / len(title_tokens | window_tokens)
+
+            # Windows are visited in line order and ties keep the earlier one,
+            # so a window whose upper bound cannot beat the best so far (or
+            # the threshold) is skipped.
+            if self._cannot_win(0.6 + 0.4 * token, best_score):
+                continue
+            matcher = self._matcher(idx)
+            matcher.set_seq1(title_lower)
+            bounded += 1
+            if (self._cannot_win(0.6 * matcher.real_quick_ratio() + 0.4 * token, best_score)
+                    or self._cannot_win(0.6 * matcher.quick_ratio() + 0.4 * token, best_score)):
+                continue
+
+            full += 1
+            hybrid_score = 0.6 * matcher.ratio() + 0.4 * token
+            if hybrid_score > best_score:
+                best_score = hybrid_score
+                best_idx = idx
+
+        tracing.count("match_windows", len(candidates))
+        tracing.count("sequence_matcher_bounds", bounded)
+        tracing.count("sequence_matcher_ratios", full)
+        return best_idx, best_score
 
 def extract_section_blocks(doc_name, outlines, page_texts):
     blocks = []
+    page_indexes = {}
 
     for outline in outlines:
         title, page_num = outline["text"], outline["page"]
         if page_num >= len(page_texts):
             continue
 
-        lines = page_texts[page_num].split('\n')
-        best_idx, best_score = -1, 0
-
-        for idx in range(len(lines)):
-            line = lines[idx].strip()
-            next_line = lines[idx + 1].strip() if idx + 1 < len(lines) else ""
-            combined = f"{line} {next_line}".strip()
-
-            fuzzy = SequenceMatcher(None, title.lower(), combined.lower()).ratio()
-            token = token_overlap_ratio(title, combined)
-            hybrid_score = 0.6 * fuzzy + 0.4 * token
-
-            if hybrid_score > best_score:
-                best_score = hybrid_score
-                best_idx = idx
+        index = page_indexes.get(page_num)
+        if index is None:
+            index = page_indexes[page_num] = PageLineIndex(page_texts[page_num])
+        lines = index.lines
+        best_idx, best_score = index.best_match(title)
 
         # Confidence threshold to suppress noisy matches
-        if best_score < 0.68:
+        if best_score < MATCH_THRESHOLD:
             continue
 
         # Extract top 2 paragraphs after the heading
@@ -321,24 +530,39 @@ def extract_section_blocks(doc_name, outlines, page_texts):
         if not body or body.count("•") > 3 or len(body.split()) < 25:
             continue
 
-        blocks.append(enrich_block_with_nlp({
+        # Entities and keywords are added later by enrich_blocks, in one batch
+        blocks.append({
             "doc": doc_name,
             "page": page_num,
             "section_title": title,
             "body_text": body
-        }))
+        })
 
     return blocks
 
 
 ### PAGE TEXT EXTRACTOR ###
 
-def extract_pages_text(doc_path):
-    return [page.get_text() for page in fitz.open(doc_path)]
+def extract_pages_text(doc_path, pages=None):
+    if pages is None:
+        pages = iter_pages(doc_path)
+    return [page["text"] for page in pages]
 
-def enrich_block_with_nlp(block):
-    doc = nlp(block["body_text"])
+### NLP ENRICHMENT ###
+
+def enrich_blocks(blocks, batch_size=64, n_process=1):
+    """Streams every block's body through nlp.pipe and adds entities and keywords."""
+    docs = get_model("spacy").pipe(
+        (block["body_text"] for block in blocks),
+        batch_size=batch_size,
+        n_process=n_process,
+    )
+    for block, doc in zip(blocks, docs):
+        apply_nlp_annotations(block, doc)
+    tracing.count("spacy_docs", len(blocks))
+    return blocks
 
+def apply_nlp_annotations(block, doc):
     # 1. Named Entities
     entities = [{"text": ent.text, "label": ent.label_} for ent in doc.ents]
 
@@ -1,73 +1,111 @@
 import re
-from typing import List, Dict
-
-def refine_outline_structure(outlines: List[Dict]) -> List[Dict]:
-    def calculate_heading_score(text: str) -> int:
-        score = 0
-        text = text.strip()
-        words = text.split()
-        word_count = len(words)
-        char_count = len(text)
-
-        # Rule 1: Too short (not informative)
-        if word_count < 2 or char_count < 10:
-            score += 2
-
-        # Rule 2: Suspicious casing and long text
-        if text.islower() and word_count > 6:
-            score += 1
-        if text.isupper() and word_count > 4:
-            score += 1
-
-        # Rule 3: Starts with number or quantity unit — usually instructions or ingredients
-        if re.search(r"^\d+(\.|\))?\s?", text):  # "1. Step..."
-            score += 2
-        if re.search(r"\b\d+/?\d*\s?(cups?|tablespoons?|tbsp|tsp|grams?|oz|ml|liters?)\b", text, re.IGNORECASE):
-            score += 2
-
-        # Rule 4: High digit density — indicative of recipe content
-        digits = sum(c.isdigit() for c in text)
-        letters = sum(c.isalpha() for c in text)
-        if letters > 0 and digits / letters > 0.3:
-            score += 1
-
-        # Rule 5: Bullet or list markers
-        if re.match(r"^[•\-\*\u2022]+\s", text):
-            score += 1
-
-        # Rule 6: Too many commas but no structure (no colon)
-        if text.count(",") >= 3 and ":" not in text:
-            score += 1
-
-        # Rule 7: Very long line without structural indicator (like ':')
-        if word_count > 25 and ":" not in text:
-            score += 2
-
-        # Rule 8: Ends with a period but no colon — likely a sentence
-        if text.endswith(".") and ":" not in text:
-            score += 1
-
-        # Rule 9: Starts with imperative/instructional verb (typical in recipes, guides)
-        if re.match(r"^(Add|Pour|Top|Stir|Crack|Serve|Preheat|Place|Spread|Press|Heat|Combine|"
-                    r"Bake|Mix|Whisk|Cook|Boil|Grease|Remove|Slice|Chop|Set|Let|Transfer|Layer|Use|Keep|Bring)\b", text, re.IGNORECASE):
-            score += 2
-
-        # Rule 10: Generic short ingredient phrases (likely not headings)
-        if re.match(r"^[A-Z][a-z]+\s(and|or)?\s?(pepper|salt|oil|egg|onion|cheese|spinach|bread|fruit|honey)\b", text, re.IGNORECASE):
-            if word_count < 5:
-                score += 2
-
-        return score
-
-    filtered_outlines = []
-    seen_texts = set()
-
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+from modules import tracing
+
+MEASUREMENT_UNITS = r"cups?|tablespoons?|tbsp|tsp|grams?|oz|ml|liters?"
+IMPERATIVE_VERBS = (
+    "Add", "Pour", "Top", "Stir", "Crack", "Serve", "Preheat", "Place", "Spread", "Press", "Heat", "Combine",
+    "Bake", "Mix", "Whisk", "Cook", "Boil", "Grease", "Remove", "Slice", "Chop", "Set", "Let", "Transfer",
+    "Layer", "Use", "Keep", "Bring",
+)
+INGREDIENTS = ("pepper", "salt", "oil", "egg", "onion", "cheese", "spinach", "bread", "fruit", "honey")
+# Common culinary noise starters
+INSTRUCTION_STARTS = (
+    "pinch of", "salt and pepper", "toppings:", "instructions:", "optional:", "preheat",
+    "add ", "bake ", "stir ", "pour ", "serve", "combine", "drizzle", "cook"
+)
+
+NUMBERED_RE = re.compile(r"\d")  # "1. Step...", "2) ..."
+MEASUREMENT_RE = re.compile(rf"\b\d+/?\d*\s?({MEASUREMENT_UNITS})\b", re.IGNORECASE)
+BULLET_RE = re.compile(r"[•\-\*]+\s")
+IMPERATIVE_RE = re.compile(rf"({'|'.join(IMPERATIVE_VERBS)})\b", re.IGNORECASE)
+INGREDIENT_RE = re.compile(rf"[A-Z][a-z]+\s(and|or)?\s?({'|'.join(INGREDIENTS)})\b", re.IGNORECASE)
+
+
+def starts_like_instruction(text: str) -> bool:
+    return text.lower().startswith(INSTRUCTION_STARTS)
+
+
+def mentions_measurement(text: str) -> bool:
+    # Quantities with units: likely an ingredient line
+    return MEASUREMENT_RE.search(text) is not None
+
+
+def too_digit_dense(text: str) -> bool:
+    # High digit density is indicative of recipe content
+    letters = sum(c.isalpha() for c in text)
+    return letters > 0 and sum(c.isdigit() for c in text) / letters > 0.3
+
+
+# Heading rejection rules as (name, weight, check(text, word_count)), compiled
+# once at import. A heading is rejected as soon as its score reaches
+# REJECT_SCORE, so the plain string tests run first and the regexes last.
+# The extractor's line prefilter runs the instruction and measurement checks
+# through the same functions.
+HEADING_RULES: Tuple[Tuple[str, int, Callable[[str, int], bool]], ...] = (
+    # Too short to be informative
+    ("too_short", 2, lambda text, words: words < 2 or len(text) < 10),
+    # Ends with a period but has no colon: likely a sentence
+    ("sentence", 1, lambda text, words: text.endswith(".") and ":" not in text),
+    # Very long, with no structural indicator like ':'
+    ("too_long", 2, lambda text, words: words > 25 and ":" not in text),
+    # Several commas but no structure (no colon)
+    ("comma_list", 1, lambda text, words: text.count(",") >= 3 and ":" not in text),
+    # Suspicious casing on long text
+    ("long_lowercase", 1, lambda text, words: words > 6 and text.islower()),
+    ("long_uppercase", 1, lambda text, words: words > 4 and text.isupper()),
+    # Starts with a number: usually an instruction step
+    ("numbered", 2, lambda text, words: NUMBERED_RE.match(text) is not None),
+    ("bullet", 1, lambda text, words: BULLET_RE.match(text) is not None),
+    ("instruction_start", 2, lambda text, words: starts_like_instruction(text)),
+    ("digit_dense", 1, lambda text, words: too_digit_dense(text)),
+    ("measurement", 2, lambda text, words: mentions_measurement(text)),
+    # Starts with an imperative verb, as recipe and guide steps do
+    ("imperative", 2, lambda text, words: IMPERATIVE_RE.match(text) is not None),
+    # Generic short ingredient phrases
+    ("ingredient", 2, lambda text, words: words < 5 and INGREDIENT_RE.match(text) is not None),
+)
+
+# Headings are kept only when no rule fires
+REJECT_SCORE = 1
+
+
+def rejecting_rule(text: str, rules=HEADING_RULES, reject_score: int = REJECT_SCORE) -> Optional[str]:
+    """Name of the rule that brings the heading's score to reject_score, or None if it is kept."""
+    text = text.strip()
+    word_count = len(text.split())
+    score = 0
+    for name, weight, check in rules:
+        if check(text, word_count):
+            score += weight
+            if score >= reject_score:
+                return name
+    return None
+
+
+def filter_headings(outlines: List[Dict], rules=HEADING_RULES,
+                    reject_score: int = REJECT_SCORE) -> Tuple[List[Dict], Counter]:
+    """
+    Runs the rules over a whole outline. Returns the kept items, each text
+    once and in order, and how many items every rule (or "duplicate") rejected.
+    """
+    kept, hits = [], Counter()
+    decisions = {}
     for item in outlines:
         clean_text = item["text"].strip()
+        if clean_text not in decisions:
+            decisions[clean_text] = rejecting_rule(clean_text, rules, reject_score)
+            if decisions[clean_text] is None:
+                kept.append(item)
+                continue
+        hits[decisions[clean_text] or "duplicate"] += 1
+    return kept, hits
 
-        # Final strict filter: score must be 0 (perfectly clean)
-        if clean_text not in seen_texts and calculate_heading_score(clean_text) == 0:
-            filtered_outlines.append(item)
-            seen_texts.add(clean_text)
 
-    return filtered_outlines
+def refine_outline_structure(outlines: List[Dict]) -> List[Dict]:
+    kept, hits = filter_headings(outlines)
+    for rule, count in hits.items():
+        tracing.count(f"heading_rule_{rule}", count)
+    return kept
@@ -0,0 +1,72 @@
+import math
+import re
+from collections import Counter, defaultdict
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in into is it its of on or that the their this to was "
+    "were will with you your our we i".split()
+)
+
+# The spaCy keywords summarise a section, so each counts as this many body mentions
+KEYWORD_WEIGHT = 2
+
+
+def tokenize(text):
+    return [token for token in TOKEN_RE.findall(text.lower()) if len(token) > 1 and token not in STOPWORDS]
+
+
+def section_tokens(body_text, keywords=()):
+    tokens = tokenize(body_text)
+    for keyword in keywords:
+        tokens.extend(tokenize(keyword) * KEYWORD_WEIGHT)
+    return tokens
+
+
+class BM25:
+    """
+    Okapi BM25 over a fixed set of token lists. Postings are kept as NumPy
+    arrays, so scoring a query costs one vectorised update per query term.
+    """
+
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.k1 = k1
+        n_docs = len(documents)
+        lengths = np.array([len(tokens) for tokens in documents], dtype=np.float64)
+        average = lengths.mean() if n_docs and lengths.mean() > 0 else 1.0
+        self.n_docs = n_docs
+        self.length_norm = k1 * (1 - b + b * lengths / average)
+
+        postings = defaultdict(lambda: ([], []))
+        for doc_id, tokens in enumerate(documents):
+            for term, tf in Counter(tokens).items():
+                docs, tfs = postings[term]
+                docs.append(doc_id)
+                tfs.append(tf)
+        self.postings = {
+            term: (np.array(docs, dtype=np.int64), np.array(tfs, dtype=np.float64))
+            for term, (docs, tfs) in postings.items()
+        }
+        self.idf = {
+            term: math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, (docs, _) in self.postings.items()
+        }
+
+    def scores(self, query_tokens):
+        scores = np.zeros(self.n_docs)
+        for term in set(query_tokens):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            docs, tfs = posting
+            scores[docs] += self.idf[term] * tfs * (self.k1 + 1) / (tfs + self.length_norm[docs])
+        return scores
+
+
+def lexical_scores(queries, bodies, keywords=None):
+    """(sections x queries) BM25 scores of every section's body and, when given, keywords."""
+    keywords = keywords if keywords is not None else [()] * len(bodies)
+    index = BM25([section_tokens(body, section_keywords) for body, section_keywords in zip(bodies, keywords)])
+    return np.stack([index.scores(tokenize(query)) for query in queries], axis=1)
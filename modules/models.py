@@ -0,0 +1,115 @@
+"""
+Lazy registry for the NLP models used by the pipeline.
+
+Nothing heavy is imported or loaded until a model is first requested, so
+importing the pipeline (``--help``, empty collections, pool workers that only
+need some of the models) stays cheap. Models are never downloaded at runtime;
+they must be installed ahead of time (see the Dockerfile).
+"""
+import threading
+
+SPACY_MODEL_NAME = "en_core_web_sm"
+# Enrichment needs ner (entities), parser (noun chunks) and tagger,
+# attribute_ruler and lemmatizer (noun lemmas), plus the tok2vec they listen
+# to. The standalone sentence recognizer is never used, so it is not loaded.
+SPACY_EXCLUDE = ["senter"]
+SENTENCE_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+# "torch" runs the model as published (fp32); "int8" applies PyTorch dynamic
+# quantization to its Linear layers, which is faster on CPU at a small cost in
+# precision (see benchmarks/backend_parity.py before switching)
+SENTENCE_BACKENDS = ("torch", "int8")
+_sentence_backend = "torch"
+# Intra-op threads for torch; None keeps torch's default (one per core)
+_num_threads = None
+
+# NLTK resource name -> path looked up by nltk.data.find
+NLTK_RESOURCES = {
+    "punkt": "tokenizers/punkt",
+    "averaged_perceptron_tagger": "taggers/averaged_perceptron_tagger",
+}
+
+_loaders = {}
+_models = {}
+_lock = threading.Lock()
+
+
+def register(name):
+    def decorator(loader):
+        _loaders[name] = loader
+        return loader
+    return decorator
+
+
+def get_model(name):
+    model = _models.get(name)
+    if model is None:
+        with _lock:
+            model = _models.get(name)
+            if model is None:
+                model = _models[name] = _loaders[name]()
+    return model
+
+
+def configure_sentence_backend(backend="torch", num_threads=None):
+    """Selects how the sentence model runs; a model already loaded another way is dropped."""
+    global _sentence_backend, _num_threads
+    if backend not in SENTENCE_BACKENDS:
+        raise ValueError(f"Unknown sentence backend {backend!r}; choose from {', '.join(SENTENCE_BACKENDS)}")
+    with _lock:
+        if (backend, num_threads) != (_sentence_backend, _num_threads):
+            _models.pop("sentence", None)
+        _sentence_backend, _num_threads = backend, num_threads
+
+
+def sentence_model_id():
+    """Identifies the embeddings the sentence model produces, for caches and indexes."""
+    if _sentence_backend == "torch":
+        return SENTENCE_MODEL_NAME
+    return f"{SENTENCE_MODEL_NAME}+{_sentence_backend}"
+
+
+def warm_up(names=None):
+    """Loads the given models (all registered ones by default) up front."""
+    for name in names if names is not None else list(_loaders):
+        get_model(name)
+
+
+### LOADERS ###
+
+@register("spacy")
+def load_spacy():
+    import spacy
+    return spacy.load(SPACY_MODEL_NAME, exclude=SPACY_EXCLUDE)
+
+
+@register("nltk")
+def load_nltk():
+    import nltk
+    from nltk import pos_tag, pos_tag_sents, word_tokenize
+
+    missing = []
+    for resource, path in NLTK_RESOURCES.items():
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            missing.append(resource)
+    if missing:
+        raise LookupError(
+            f"Missing NLTK data: {', '.join(missing)}. "
+            f"Install it with: python -m nltk.downloader {' '.join(missing)}"
+        )
+    return word_tokenize, pos_tag, pos_tag_sents
+
+
+@register("sentence")
+def load_sentence_model():
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    if _num_threads:
+        torch.set_num_threads(_num_threads)
+    model = SentenceTransformer(SENTENCE_MODEL_NAME, device="cpu")
+    if _sentence_backend == "int8":
+        torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    return model.eval()
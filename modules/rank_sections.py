@@ -1,16 +1,40 @@
-def rank_sections(scored_sections):
+def rank_store(store, order):
     """
-    Takes a list of scored sections and returns cleaned, ranked sections
-    for output JSON.
+    Builds the ranked section records for output JSON from a SectionStore
+    ranking: order holds the store's rows, best first.
     """
     extracted_sections = []
-    
-    for rank, sec in enumerate(scored_sections, start=1):
+
+    for rank, row in enumerate(order.tolist(), start=1):
         extracted_sections.append({
-            "document": sec["doc"],
-            "section_title": sec["section_title"],
+            "document": store.doc(row),
+            "section_title": store.titles[row],
             "importance_rank": rank,
-            "page_number": sec["page"]
+            "page_number": store.pages[row]
         })
-    
+        if row in store.duplicates:
+            extracted_sections[-1]["duplicates"] = store.duplicates[row]
+
+    return extracted_sections
+
+
+def rank_from_index(index, query_embedding, top_k=10, approximate=False, n_probe=8):
+    """
+    Returns the top_k sections of a CorpusIndex for a query embedding in the
+    same format as rank_store (plus the collection), without scoring or
+    sorting anything beyond what the index search touches.
+    """
+    extracted_sections = []
+
+    for rank, (row, score) in enumerate(index.search(query_embedding, top_k, approximate, n_probe), start=1):
+        meta = index.metadata(row)
+        extracted_sections.append({
+            "collection": meta["collection"],
+            "document": meta["doc"],
+            "section_title": meta["section_title"],
+            "importance_rank": rank,
+            "page_number": meta["page"],
+            "score": round(score, 4)
+        })
+
     return extracted_sections
@@ -0,0 +1,76 @@
+import re
+
+import numpy as np
+
+from modules import tracing
+from modules.relevence_model import encode_texts
+
+# Sentences end at . ! or ? before whitespace; bullets start a new one
+SENTENCE_BOUNDARY_RE = re.compile(r"(?<=[.!?])\s+|\s*•\s*")
+MIN_SENTENCE_CHARS = 3
+
+
+def split_sentences(text):
+    """The text's sentences and bullet items, each with its line wraps collapsed."""
+    sentences = (" ".join(piece.split()) for piece in SENTENCE_BOUNDARY_RE.split(text))
+    return [sentence for sentence in sentences if len(sentence) >= MIN_SENTENCE_CHARS]
+
+
+def truncate_words(text, max_chars):
+    """text cut to at most max_chars, at the last word boundary that fits."""
+    if len(text) <= max_chars:
+        return text
+    head, _, _ = text[:max_chars + 1].rpartition(" ")
+    return head.rstrip() or text[:max_chars]
+
+
+def select_sentences(sentences, scores, max_chars):
+    """
+    Takes sentences best score first while they fit in max_chars and returns
+    them joined in their original order. When not even one fits, the best
+    sentence is cut at a word boundary instead.
+    """
+    ranking = np.argsort(-scores, kind="stable").tolist()
+    chosen, used = [], 0
+    for i in ranking:
+        length = len(sentences[i]) + (1 if chosen else 0)
+        if used + length > max_chars:
+            continue  # a shorter sentence may still fit
+        chosen.append(i)
+        used += length
+    if not chosen and ranking:
+        return truncate_words(sentences[ranking[0]], max_chars)
+    return " ".join(sentences[i] for i in sorted(chosen))
+
+
+def refine_top_sections(query_embeddings, bodies, orders, top_k, max_chars):
+    """
+    Extractive refinement of each query's top_k sections.
+
+    The sentences of every selected section are embedded together in one
+    batched encode_texts pass, and each section keeps the sentences closest to the query within max_chars.
+    Returns one list of (row, refined_text) per query, in rank order.
+    """
+    rows = sorted({row for order in orders for row in order[:top_k].tolist()})
+    sentences = {row: split_sentences(bodies[row]) for row in rows}
+    unique = list(dict.fromkeys(sentence for row in rows for sentence in sentences[row]))
+    position = {sentence: i for i, sentence in enumerate(unique)}
+
+    tracing.count("refined_sections", len(rows))
+    with tracing.span("refine_text", sections=len(rows), sentences=len(unique)):
+        # Not through the section embedding cache: sentences rarely recur
+        # across runs and would evict the section vectors that do.
+        # (sentences x queries) cosine similarities in one product
+        similarities = encode_texts(unique) @ query_embeddings.T
+
+    refined = []
+    for query_index, order in enumerate(orders):
+        refined.append([
+            (row, select_sentences(
+                sentences[row],
+                similarities[[position[sentence] for sentence in sentences[row]], query_index],
+                max_chars,
+            ))
+            for row in order[:top_k].tolist()
+        ])
+    return refined
@@ -1,29 +1,122 @@
-from sentence_transformers import SentenceTransformer, util
-import torch
-from modules.rank_sections import rank_sections
-# Load the model (make sure to download in advance and cache for offline use)
-model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+import math
 
-def compute_relevance_score(query, sections):
+import numpy as np
+from modules.embedding_cache import EmbeddingCache
+from modules.corpus_index import CorpusIndex, top_k_indices
+from modules.lexical import lexical_scores
+from modules import tracing
+from modules.models import get_model, sentence_model_id
+
+# Sections encoded per forward pass
+ENCODE_BATCH_SIZE = 64
+
+
+def open_embedding_cache(cache_dir, max_entries=100_000):
+    # Each backend's embeddings are cached (and indexed) apart from the others
+    return EmbeddingCache(cache_dir, sentence_model_id(), max_entries)
+
+
+def open_corpus_index(index_dir):
+    return CorpusIndex(index_dir, sentence_model_id())
+
+
+def encode_texts(texts, batch_size=ENCODE_BATCH_SIZE, cache=None):
+    """
+    Encodes texts in batches and returns an L2-normalised float32 matrix
+    whose rows follow the input order. SentenceTransformer.encode sorts the
+    inputs by length before batching, so each batch carries little padding.
+
+    With a cache, only the texts it does not already hold reach the model.
+    """
+    model = get_model("sentence")
+    texts = list(texts)
+    embeddings = np.zeros((len(texts), model.get_sentence_embedding_dimension()), dtype=np.float32)
+    if not texts:
+        return embeddings
+
+    hits = cache.get_many(texts) if cache is not None else {}
+    for i, vector in hits.items():
+        embeddings[i] = vector
+
+    missing = [i for i in range(len(texts)) if i not in hits]
+    tracing.count("embedding_cache_hits", len(hits))
+    if missing:
+        tracing.count("encoded_texts", len(missing))
+        tracing.count("encode_batches", math.ceil(len(missing) / batch_size))
+        with tracing.span("encode", texts=len(missing)):
+            encoded = model.encode(
+                [texts[i] for i in missing],
+                batch_size=batch_size,
+                convert_to_numpy=True,
+                show_progress_bar=False,
+            ).astype(np.float32, copy=False)
+        embeddings[missing] = normalize_rows(encoded)
+        if cache is not None:
+            cache.put_many([texts[i] for i in missing], embeddings[missing])
+
+    return embeddings
+
+
+def normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def rank_texts(queries, texts, batch_size=ENCODE_BATCH_SIZE, cache=None, prefilter_top_n=None, keywords=None,
+               query_embeddings=None):
     """
-    query: str (Persona + job-to-be-done)
-    sections: list of dicts with keys: {'text': str, 'title': str, 'doc': str, 'page': int}
-    
-    Returns: list of dicts with added key 'score'
+    Ranks section bodies against every query without building per-section records.
+
+    prefilter_top_n: when set, only the union of each query's prefilter_top_n
+    best texts under BM25 (bodies plus their keywords) is embedded; the other
+    texts follow the dense ranking in BM25 order with a NaN score
+    query_embeddings: encode_texts(queries), when the caller needs them too
+
+    Returns (orders, scores): one int array of text positions per query, best
+    first, and the (texts x queries) matrix of rounded cosine scores.
     """
-    query_embedding = model.encode(query, convert_to_tensor=True)
-    
-    for section in sections:
-        section_text = section['body_text']
-        section_embedding = model.encode(section_text, convert_to_tensor=True)
-        similarity = util.pytorch_cos_sim(query_embedding, section_embedding).item()
-        section['score'] = round(similarity, 4)
-    
-    # Sort by descending score
-    sorted_sections = sorted(sections, key=lambda x: x['score'], reverse=True)
-    
-    return sorted_sections
+    lexical = None
+    if prefilter_top_n is None or len(texts) <= prefilter_top_n:
+        candidates = np.arange(len(texts))
+    else:
+        lexical = lexical_scores(queries, texts, keywords)
+        candidates = np.asarray(prefilter_candidates(lexical, prefilter_top_n), dtype=np.int64)
+        tracing.count("prefilter_skipped", len(texts) - len(candidates))
+
+    if query_embeddings is None:
+        query_embeddings = encode_texts(queries)
+    section_embeddings = encode_texts([texts[i] for i in candidates.tolist()], batch_size, cache)
+    return order_sections(query_embeddings, section_embeddings, len(texts), candidates, lexical)
+
 
+def prefilter_candidates(lexical, top_n):
+    """Sorted positions of the sections among the top_n of any query (columns of lexical)."""
+    return sorted({int(i) for column in lexical.T for i in top_k_indices(column, top_n)})
 
 
+def order_sections(query_embeddings, section_embeddings, n_sections=None, candidates=None, lexical=None):
+    """
+    The scoring half of rank_texts, on embeddings computed already.
+    section_embeddings holds the rows of candidates (all sections by default);
+    the remaining sections are ordered by their lexical scores.
+    """
+    if candidates is None:
+        candidates = np.arange(len(section_embeddings))
+    n_sections = len(candidates) if n_sections is None else n_sections
+
+    # (sections x queries) cosine similarities in one product, rounded with
+    # Python's round as the scores always have been, so ties break the same way
+    similarities = section_embeddings @ query_embeddings.T
+    scores = np.full((n_sections, len(query_embeddings)), np.nan)
+    if len(candidates):
+        scores[candidates] = [[round(similarity, 4) for similarity in row] for row in similarities.tolist()]
 
+    rest = np.setdiff1d(np.arange(n_sections), candidates)
+    orders = []
+    for query_index in range(len(query_embeddings)):
+        # Stable descending sorts keep section order among equal scores
+        order = candidates[np.argsort(-scores[candidates, query_index], kind="stable")]
+        if len(rest):
+            order = np.concatenate([order, rest[np.argsort(-lexical[rest, query_index], kind="stable")]])
+        orders.append(order)
+    return orders, scores
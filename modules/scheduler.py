@@ -0,0 +1,158 @@
+"""
+Staged producer/consumer scheduling for batch runs.
+
+``run_stages`` pushes a sequence of items through a chain of stage
+functions. Every stage but the last runs in its own thread, and consecutive
+stages are joined by bounded queues. While one stage works on an item, the
+stage before it is already working on the next one. Once a stage is
+``depth`` items ahead of its consumer it blocks, which keeps memory bounded.
+The total time then tends to the time of the slowest stage rather than the
+sum of all of them.
+"""
+import queue
+import threading
+
+_DONE = object()
+POLL_INTERVAL = 0.1  # seconds between checks for a failed stage while blocked
+
+
+class _Failed:
+    __slots__ = ("error", "item")
+
+    def __init__(self, error, item=None):
+        self.error = error
+        self.item = item  # what the failing stage was given
+
+
+def _put(q, item, stop):
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=POLL_INTERVAL)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _get(q, stop):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=POLL_INTERVAL)
+        except queue.Empty:
+            pass
+    return _DONE
+
+
+def _fail(failures, error, item, stop):
+    # Stop every stage now, not once the failure would reach the last one
+    failures.append(_Failed(error, item))
+    stop.set()
+
+
+def _run_stage(stage, inbox, outbox, stop, unfinished, failures):
+    while True:
+        item = _get(inbox, stop)
+        if item is _DONE:
+            break
+        try:
+            result = stage(item)
+        except BaseException as e:
+            _fail(failures, e, item, stop)
+            return
+        if result is None:
+            continue
+        if not _put(outbox, result, stop):
+            unfinished.append(result)
+            return
+    _put(outbox, _DONE, stop)
+
+
+def _feed(items, outbox, stop, failures):
+    try:
+        for item in items:
+            if not _put(outbox, item, stop):
+                return
+    except BaseException as e:
+        _fail(failures, e, None, stop)
+        return
+    _put(outbox, _DONE, stop)
+
+
+def run_stages(items, stages, depth=1, discard=None):
+    """
+    Runs every item through stages, in order, and returns the last stage's
+    results in input order.
+
+    stages: functions that each take the previous stage's result. A stage
+    that returns None drops the item.
+    depth: items that may wait between two stages. 0 runs each item
+    through all stages before starting the next, in the calling thread.
+
+    The first exception raised by any stage stops every stage at once. It is
+    re-raised here once the stage threads have finished, after discard (when
+    given) has been called on every item left unfinished: the one the failing
+    stage was given and those still in flight.
+    """
+    *upstream, last = stages
+    if depth <= 0:
+        results = []
+        for item in items:
+            for stage in stages:
+                try:
+                    item = stage(item)
+                except BaseException:
+                    if discard is not None:
+                        discard(item)
+                    raise
+                if item is None:
+                    break
+            else:
+                results.append(item)
+        return results
+
+    stop = threading.Event()
+    unfinished, failures = [], []
+    queues = [queue.Queue(maxsize=depth) for _ in range(len(stages))]
+    threads = [threading.Thread(target=_feed, args=(items, queues[0], stop, failures), name="stage-feed",
+                                daemon=True)]
+    threads.extend(
+        threading.Thread(target=_run_stage, args=(stage, queues[i], queues[i + 1], stop, unfinished, failures),
+                         name=f"stage-{getattr(stage, '__name__', i)}", daemon=True)
+        for i, stage in enumerate(upstream)
+    )
+    for thread in threads:
+        thread.start()
+
+    results = []
+    item = None
+    try:
+        while True:
+            item = _get(queues[-1], stop)
+            if item is _DONE:
+                break
+            result = last(item)
+            if result is not None:
+                results.append(result)
+        if failures:
+            raise failures[0].error
+    except BaseException:
+        stop.set()
+        for thread in threads:
+            thread.join()
+        if discard is not None:
+            unfinished.append(item)
+            unfinished.extend(failures)
+            for q in queues[1:]:  # the first holds inputs no stage has started on
+                while not q.empty():
+                    unfinished.append(q.get_nowait())
+            for leftover in unfinished:
+                if isinstance(leftover, _Failed):
+                    leftover = leftover.item
+                if leftover is not None and leftover is not _DONE:
+                    discard(leftover)
+        raise
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+    return results
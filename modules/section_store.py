@@ -0,0 +1,73 @@
+from array import array
+from collections import defaultdict
+
+
+class SectionStore:
+    """
+    Columnar store of a collection's sections.
+
+    Each field is one column with an entry per section (row), so a section
+    costs a few array slots rather than a dict of its own. Document names
+    are interned in a small table, and every body text is held once and
+    referenced by row. The subsection records are built from it when they
+    are written, and rankings are arrays of row indices into it.
+    """
+
+    __slots__ = ("doc_names", "_doc_ids", "doc_ids", "pages", "titles", "bodies", "keywords", "duplicates")
+
+    def __init__(self):
+        self.doc_names = []
+        self._doc_ids = {}
+        self.doc_ids = array("I")
+        self.pages = array("i")
+        self.titles = []
+        self.bodies = []
+        self.keywords = []
+        self.duplicates = {}  # row -> [{"doc", "page", "section_title"}] folded into it
+
+    def append(self, block, duplicates=None):
+        """Adds an extracted block (doc, page, section_title, body_text, keywords) and returns its row."""
+        row = len(self.bodies)
+        doc_id = self._doc_ids.get(block["doc"])
+        if doc_id is None:
+            doc_id = self._doc_ids[block["doc"]] = len(self.doc_names)
+            self.doc_names.append(block["doc"])
+        self.doc_ids.append(doc_id)
+        self.pages.append(block["page"])
+        self.titles.append(block["section_title"])
+        self.bodies.append(block["body_text"])
+        self.keywords.append(tuple(block.get("keywords", ())))
+        if duplicates:
+            self.duplicates[row] = duplicates
+        return row
+
+    def __len__(self):
+        return len(self.bodies)
+
+    def doc(self, row):
+        return self.doc_names[self.doc_ids[row]]
+
+    def section(self, row):
+        return {"doc": self.doc(row), "page": self.pages[row], "section_title": self.titles[row],
+                "body_text": self.bodies[row]}
+
+    def rows_by_doc(self):
+        rows = defaultdict(list)
+        for row, doc_id in enumerate(self.doc_ids):
+            rows[self.doc_names[doc_id]].append(row)
+        return rows
+
+    ### OUTPUT RECORDS ###
+
+    def subsection_record(self, row, refined_text=None):
+        record = {
+            "doc": self.doc(row),
+            "page": self.pages[row],
+            "refined_text": self.bodies[row] if refined_text is None else refined_text
+        }
+        if row in self.duplicates:
+            record["duplicates"] = self.duplicates[row]
+        return record
+
+    def subsection_records(self):
+        return (self.subsection_record(row) for row in range(len(self)))
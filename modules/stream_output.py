@@ -0,0 +1,40 @@
+import json
+
+
+class JsonlOutputWriter:
+    """
+    Writes a collection's results as JSON Lines while they are produced.
+
+    Every line is one record tagged with a "type": a "metadata" record first,
+    then one "subsection_analysis" record per stored section (written once the
+    whole collection is extracted, deduplicated and enriched), one
+    "ranked_section" record per ranked section, and a final "end" record with
+    the counts. Lines are flushed as they are written, so a consumer can
+    follow the file before the collection is done; the "end" record tells it
+    the file is complete.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.counts = {}
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, record_type, record):
+        self._file.write(json.dumps({"type": record_type, **record}, ensure_ascii=False))
+        self._file.write("\n")
+        self._file.flush()
+        self.counts[record_type] = self.counts.get(record_type, 0) + 1
+
+    def close(self, complete=True):
+        if self._file.closed:
+            return
+        if complete:
+            self.write("end", {"counts": dict(self.counts)})
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # A run that failed half-way leaves no "end" record behind
+        self.close(complete=exc_type is None)
@@ -0,0 +1,213 @@
+"""
+Opt-in profiling of the pipeline: timed spans, work counters and memory.
+
+Instrumented code calls ``span(name, **args)`` around a stage and
+``count(name, n)`` for the work it did. Both do nothing until ``enable()`` is
+called: ``span`` then hands back one shared no-op context manager and
+``count`` returns immediately, so leaving the hooks in costs next to nothing.
+
+Once enabled, every span records its wall and CPU time. CPU time is the
+calling thread's, except for the model-inference spans in PROCESS_CPU_SPANS:
+torch and spaCy do most of their work on their own threads there, so those
+spans count the whole process (including any other stage running at the
+same time). A background thread
+samples the resident set size, and each span keeps the peak seen while it
+ran. ``write_chrome_trace`` exports everything in the Chrome trace event
+format, which chrome://tracing and https://ui.perfetto.dev can load.
+``summary`` formats the per-stage table printed at the end of a run.
+Extraction workers record their own spans; ``drain`` and ``merge`` ship
+them back to the parent process.
+"""
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import nullcontext
+
+MEMORY_SAMPLE_INTERVAL = 0.05  # seconds
+PROCESS_CPU_SPANS = frozenset({"encode", "enrich"})
+
+_NULL_SPAN = nullcontext()
+_tracer = None
+
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource  # peak, not current, where /proc is unavailable
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "args", "start", "cpu_clock", "cpu_start", "wall_start", "first_sample")
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.cpu_clock = time.process_time if name in PROCESS_CPU_SPANS else time.thread_time
+
+    def __enter__(self):
+        self.first_sample = len(self.tracer.samples)
+        self.wall_start = time.time()
+        self.cpu_start = self.cpu_clock()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self.start
+        cpu = self.cpu_clock() - self.cpu_start
+        peak_rss = max([_rss_bytes(), *self.tracer.samples[self.first_sample:]])
+        self.tracer.record(self.name, self.args, self.wall_start, wall, cpu, peak_rss)
+
+
+class Tracer:
+    def __init__(self, sample_interval=MEMORY_SAMPLE_INTERVAL):
+        self.pid = os.getpid()
+        self.events = []
+        self.counters = Counter()
+        self.stats = defaultdict(lambda: {"calls": 0, "wall": 0.0, "cpu": 0.0, "peak_rss": 0})
+        self.samples = []  # RSS in bytes, one per sampling interval
+        self.peak_rss = _rss_bytes()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = None
+        if sample_interval:
+            self._sampler = threading.Thread(target=self._sample_memory, args=(sample_interval,), daemon=True)
+            self._sampler.start()
+
+    ### MEMORY ###
+
+    def _sample_memory(self, interval):
+        while not self._stop.wait(interval):
+            rss = _rss_bytes()
+            self.samples.append(rss)
+            self.peak_rss = max(self.peak_rss, rss)
+            self.events.append({
+                "name": "memory", "ph": "C", "ts": time.time() * 1e6, "pid": self.pid,
+                "args": {"rss_mb": round(rss / 2**20, 1)},
+            })
+
+    def stop(self):
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    ### RECORDING ###
+
+    def span(self, name, args):
+        return _Span(self, name, args)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def record(self, name, args, wall_start, wall, cpu, peak_rss):
+        self.peak_rss = max(self.peak_rss, peak_rss)
+        self.events.append({
+            "name": name, "cat": "pipeline", "ph": "X",
+            "ts": wall_start * 1e6, "dur": wall * 1e6,
+            "pid": self.pid, "tid": threading.get_ident(),
+            "args": {**args, "cpu_ms": round(cpu * 1e3, 3), "peak_rss_mb": round(peak_rss / 2**20, 1)},
+        })
+        with self._lock:
+            stats = self.stats[name]
+            stats["calls"] += 1
+            stats["wall"] += wall
+            stats["cpu"] += cpu
+            stats["peak_rss"] = max(stats["peak_rss"], peak_rss)
+
+    ### EXPORT ###
+
+    def drain(self):
+        """Hands over (and forgets) what was recorded, for merge in another process."""
+        with self._lock:
+            payload = {
+                "events": self.events, "counters": dict(self.counters),
+                "stats": {name: dict(stats) for name, stats in self.stats.items()}, "peak_rss": self.peak_rss,
+            }
+            self.events, self.counters = [], Counter()
+            self.stats.clear()
+        return payload
+
+    def merge(self, payload):
+        with self._lock:
+            self.events.extend(payload["events"])
+            self.counters.update(payload["counters"])
+            for name, other in payload["stats"].items():
+                stats = self.stats[name]
+                stats["calls"] += other["calls"]
+                stats["wall"] += other["wall"]
+                stats["cpu"] += other["cpu"]
+                stats["peak_rss"] = max(stats["peak_rss"], other["peak_rss"])
+            self.peak_rss = max(self.peak_rss, payload["peak_rss"])
+
+    def write_chrome_trace(self, path):
+        events = list(self.events)
+        end = time.time() * 1e6
+        events.extend(
+            {"name": name, "ph": "C", "ts": end, "pid": self.pid, "args": {name: value}}
+            for name, value in sorted(self.counters.items())
+        )
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms",
+                       "otherData": {"counters": dict(self.counters)}}, f)
+
+    def summary(self):
+        rows = [f"{'stage':14s} {'calls':>6s} {'wall s':>9s} {'cpu s':>9s} {'mean ms':>9s} {'peak MB':>8s}"]
+        for name, stats in sorted(self.stats.items(), key=lambda item: -item[1]["wall"]):
+            rows.append(
+                f"{name:14s} {stats['calls']:6d} {stats['wall']:9.3f} {stats['cpu']:9.3f} "
+                f"{stats['wall'] / stats['calls'] * 1e3:9.2f} {stats['peak_rss'] / 2**20:8.1f}"
+            )
+        rows.append(f"cpu s: calling thread only, except {', '.join(sorted(PROCESS_CPU_SPANS))} (whole process)")
+        if self.counters:
+            rows.append("")
+            rows.extend(f"{name:32s} {value:>10d}" for name, value in sorted(self.counters.items()))
+        rows.append(f"\npeak RSS: {self.peak_rss / 2**20:.1f} MB")
+        return "\n".join(rows)
+
+
+### MODULE-LEVEL HOOKS ###
+
+def enable(sample_interval=MEMORY_SAMPLE_INTERVAL):
+    global _tracer
+    # A forked worker inherits the parent's tracer but not its sampler thread
+    if _tracer is None or _tracer.pid != os.getpid():
+        _tracer = Tracer(sample_interval)
+    return _tracer
+
+
+def disable():
+    global _tracer
+    if _tracer is not None:
+        _tracer.stop()
+        _tracer = None
+
+
+def enabled():
+    return _tracer is not None
+
+
+def span(name, **args):
+    if _tracer is None:
+        return _NULL_SPAN
+    return _tracer.span(name, args)
+
+
+def count(name, n=1):
+    if _tracer is None:
+        return
+    _tracer.count(name, n)
+
+
+def drain():
+    return _tracer.drain() if _tracer is not None else None
+
+
+def merge(payload):
+    if _tracer is not None and payload is not None:
+        _tracer.merge(payload)
@@ -0,0 +1,51 @@
+"""
+Code-point range table for the script detection in modules.extractor.
+
+A character's script is SCRIPT_NAMES[id], where id belongs to the last range
+whose start is <= its code point (0: not a letter of a tracked script). The
+table is built from the interpreter's own unicodedata on first use (a
+fraction of a second), so it always agrees with it, whatever the Unicode
+version.
+"""
+import unicodedata
+
+import numpy as np
+
+SCRIPT_NAMES = ("", "Latin", "Cyrillic", "Japanese", "Korean", "Arabic", "Devanagari")
+LATIN = 1
+
+
+def script_id_from_name(char):
+    if not char.isalpha():
+        return 0
+    name = unicodedata.name(char, "")
+    if "LATIN" in name: return 1
+    elif "CYRILLIC" in name: return 2
+    elif "CJK" in name or "HIRAGANA" in name: return 3
+    elif "HANGUL" in name: return 4
+    elif "ARABIC" in name: return 5
+    elif "DEVANAGARI" in name: return 6
+    return 0
+
+
+def build_script_ranges():
+    starts, ids, previous = [], [], None
+    for code_point in range(0x110000):
+        script_id = script_id_from_name(chr(code_point))
+        if script_id != previous:
+            starts.append(code_point)
+            ids.append(script_id)
+            previous = script_id
+    return tuple(starts), tuple(ids)
+
+
+_ranges = None
+
+
+def script_ranges():
+    """(starts, ids) of the range table as NumPy arrays, built once per process."""
+    global _ranges
+    if _ranges is None:
+        starts, ids = build_script_ranges()
+        _ranges = (np.asarray(starts, dtype=np.uint32), np.asarray(ids, dtype=np.int64))
+    return _ranges
@@ -0,0 +1,211 @@
+"""
+Long-running service mode: the models are loaded once and collection jobs
+are accepted over a small local HTTP API (TCP or Unix socket).
+
+    POST /jobs        {"collection": "<path to a collection directory>"}
+    GET  /jobs        every job and its status
+    GET  /jobs/<id>   one job: queued / running / done / failed
+    GET  /health
+
+Jobs wait in a bounded asyncio queue and at most ``concurrency`` of them run
+at a time, each in a worker thread through the same Pipeline (caches,
+extraction pool) that a batch run uses, so a job writes exactly the
+challenge1b_output.json that run_phase_3 would. Concurrent jobs overlap only
+in extraction; the Pipeline runs their model stages one at a time. A
+collection that already has a queued or running job is refused (409), as
+both jobs would write the same output file.
+"""
+import asyncio
+import itertools
+import json
+import os
+import traceback
+from datetime import datetime
+
+from modules import models
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+DEFAULT_CONCURRENCY = 1
+QUEUE_SIZE = 100
+
+MAX_BODY_BYTES = 1 << 20
+STATUS_TEXT = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found",
+               405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+               503: "Service Unavailable"}
+
+
+class CollectionService:
+    def __init__(self, pipeline, concurrency=DEFAULT_CONCURRENCY, queue_size=QUEUE_SIZE):
+        self.pipeline = pipeline
+        self.concurrency = max(1, concurrency)
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.jobs = {}
+        self._ids = itertools.count(1)
+        self._workers = []
+
+    ### JOBS ###
+
+    def submit(self, collection_path):
+        job_id = str(next(self._ids))
+        job = {
+            "id": job_id,
+            "collection": collection_path,
+            "status": "queued",
+            "submitted": datetime.now().isoformat(),
+            "started": None,
+            "finished": None,
+            "output": None,
+            "error": None,
+        }
+        self.queue.put_nowait(job_id)  # raises QueueFull before the job is recorded
+        self.jobs[job_id] = job
+        return job
+
+    def active_job(self, collection_path):
+        """The queued or running job of collection_path, if any."""
+        for job in self.jobs.values():
+            if job["collection"] == collection_path and job["status"] in ("queued", "running"):
+                return job
+        return None
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = self.jobs[await self.queue.get()]
+            job["status"] = "running"
+            job["started"] = datetime.now().isoformat()
+            print(f"Job {job['id']}: processing {job['collection']}")
+            try:
+                job["output"] = await loop.run_in_executor(None, self.run_job, job["collection"])
+                job["status"] = "done"
+            except Exception as e:
+                traceback.print_exc()
+                job["error"] = str(e)
+                job["status"] = "failed"
+            finally:
+                job["finished"] = datetime.now().isoformat()
+                self.queue.task_done()
+
+    def run_job(self, collection_path):
+        output_path = self.pipeline.process_collection(collection_path)
+        self.pipeline.save_index()
+        return output_path
+
+    def start(self):
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+
+    ### HTTP ###
+
+    def route(self, method, path, body):
+        parts = [part for part in path.split("?", 1)[0].split("/") if part]
+
+        if parts == ["health"]:
+            return 200, {"status": "ok", "queued": self.queue.qsize(), "jobs": len(self.jobs)}
+
+        if parts == ["jobs"]:
+            if method == "GET":
+                return 200, list(self.jobs.values())
+            if method != "POST":
+                return 405, {"error": f"{method} not allowed"}
+            try:
+                collection_path = json.loads(body or b"{}").get("collection")
+            except (ValueError, AttributeError):
+                return 400, {"error": "body must be a JSON object"}
+            if not collection_path or not os.path.isdir(collection_path):
+                return 400, {"error": f"not a collection directory: {collection_path}"}
+            collection_path = os.path.abspath(collection_path)
+            active = self.active_job(collection_path)
+            if active is not None:
+                return 409, {"error": f"job {active['id']} is already {active['status']} for this collection",
+                             "job": active}
+            try:
+                return 202, self.submit(collection_path)
+            except asyncio.QueueFull:
+                return 503, {"error": "job queue is full"}
+
+        if len(parts) == 2 and parts[0] == "jobs":
+            if method != "GET":
+                return 405, {"error": f"{method} not allowed"}
+            job = self.jobs.get(parts[1])
+            if job is None:
+                return 404, {"error": f"unknown job {parts[1]}"}
+            return 200, job
+
+        return 404, {"error": f"no route for {path}"}
+
+    async def handle(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            if len(request_line) < 2:
+                status, payload = 400, {"error": "malformed request line"}
+            else:
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    status, payload = 400, {"error": "invalid Content-Length"}
+                elif length > MAX_BODY_BYTES:
+                    status, payload = 413, {"error": "request body too large"}
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    status, payload = self.route(request_line[0].upper(), request_line[1], body)
+
+            data = json.dumps(payload, indent=2, ensure_ascii=False).encode("utf-8")
+            writer.write(
+                f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                f"Connection: close\r\n\r\n".encode("latin-1") + data
+            )
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(pipeline, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None,
+                concurrency=DEFAULT_CONCURRENCY):
+    # Pay every model's cold start once, before the first job arrives
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, models.warm_up)
+
+    service = CollectionService(pipeline, concurrency)
+    service.start()
+    if socket_path:
+        server = await asyncio.start_unix_server(service.handle, path=socket_path)
+        print(f"Serving on unix:{socket_path}")
+    else:
+        server = await asyncio.start_server(service.handle, host, port)
+        print(f"Serving on http://{host}:{port}")
+
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def run_service(pipeline, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None,
+                concurrency=DEFAULT_CONCURRENCY):
+    try:
+        asyncio.run(serve(pipeline, host, port, socket_path, concurrency))
+    except KeyboardInterrupt:
+        pass